@@ -1,12 +1,19 @@
-import os, sys
-import traceback
+import os
+import logging
+from logging.handlers import QueueHandler, QueueListener
+from multiprocessing import Queue
+from contextlib import redirect_stdout
 from datetime import datetime
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
+import matplotlib
+from threadpoolctl import threadpool_limits
 
-from raphs.stardata import StarData
-from raphs.periodogram import LSPeriodogram
-from raphs.search import search_rvs, search_sinds
+from raphs.stardata import StarData, load_catalog
+from raphs.periodogram import LSPeriodogram, coarse_peak_fap
+from raphs.search import search_rvs, search_sinds, build_search_context
 from raphs.injrec import run_injrec
 
 
@@ -15,7 +22,249 @@ from raphs.injrec import run_injrec
 # LIST OF TARGET STARS (eventually, should do all stars)
 sample_stars = ['HD 190360', 'HD 115617']
 ########################################################
-   
+
+
+def _init_worker(
+    inner : int,
+    log_queue : Queue,
+    ) -> None:
+    """Initialize a per-star worker process
+
+    Args:
+        inner (int): number of cores available to each star
+        log_queue (Queue): queue used to stream log records back to the driver
+    """
+    # forward all per-star log records to the driver process
+    driver_logger = logging.getLogger('raphs.driver')
+    driver_logger.setLevel(logging.INFO)
+    driver_logger.addHandler(QueueHandler(log_queue))
+    driver_logger.propagate = False
+
+    # headless plotting
+    matplotlib.use('Agg')
+
+    # prime FFT plans shared by all periodograms in this process
+    LSPeriodogram.warmup()
+
+    # prevent BLAS/OpenMP oversubscription inside each worker; the runtimes
+    # were loaded before the fork, so OMP_NUM_THREADS would no longer apply
+    threadpool_limits(limits=inner)
+
+    return
+
+
+def _process_star(
+    star : str,
+    data_dir : str,
+    out_dir : str,
+    do_search : bool,
+    inj_rec : bool,
+    mcmc : bool,
+    sind : bool,
+    nproc : int,
+    prescreen_fap : float = None,
+    catalog_entry : dict = None,
+    ) -> None:
+    """Run the full analysis for a single star
+
+    Args:
+        star (str): target HD name as it appears in the SPORES catalog
+        data_dir (str): directory where all data is stored
+        out_dir (str): output directory
+        do_search (bool): run the RV planet search
+        inj_rec (bool): run injection and recovery tests
+        mcmc (bool): run MCMC after the RV search
+        sind (bool): run the S-index search
+        nproc (int): number of cores for this star
+        prescreen_fap (float, optional): skip the searches and injections if the
+            coarse LS peak FAP exceeds this value. Defaults to None (no prescreen).
+        catalog_entry (dict, optional): pre-loaded SPORES catalog entry. Defaults to None.
+    """
+    # output dir is created by the driver before dispatch
+    out_subdir = f'{out_dir}/{star}'
+
+    # start log file
+    logger = logging.getLogger(f'raphs.driver.{star}')
+    logger.setLevel(logging.INFO)
+    handler = logging.FileHandler(out_subdir + '/log.txt', mode='w')
+    logger.addHandler(handler)
+
+    # output printed by StarData, rvsearch, etc. goes to the same log file;
+    # a failing star is logged and does not stop the batch
+    with redirect_stdout(handler.stream):
+        try:
+            _run_pipeline(
+                star, logger, out_subdir,
+                data_dir=data_dir,
+                do_search=do_search,
+                inj_rec=inj_rec,
+                mcmc=mcmc,
+                sind=sind,
+                nproc=nproc,
+                prescreen_fap=prescreen_fap,
+                catalog_entry=catalog_entry,
+            )
+        except Exception:
+            logger.exception('Exception occurred!')
+        finally:
+            logger.removeHandler(handler)
+            handler.close()
+
+    return
+
+
+def _run_pipeline(
+    star : str,
+    logger : logging.Logger,
+    out_subdir : str,
+    data_dir : str,
+    do_search : bool,
+    inj_rec : bool,
+    mcmc : bool,
+    sind : bool,
+    nproc : int,
+    prescreen_fap : float = None,
+    catalog_entry : dict = None,
+    ) -> None:
+    """Load data and run each analysis step for a single star
+
+    Args:
+        star (str): target HD name as it appears in the SPORES catalog
+        logger (logging.Logger): per-star logger
+        out_subdir (str): output directory for this star
+        data_dir (str): directory where all data is stored
+        do_search (bool): run the RV planet search
+        inj_rec (bool): run injection and recovery tests
+        mcmc (bool): run MCMC after the RV search
+        sind (bool): run the S-index search
+        nproc (int): number of cores for this star
+        prescreen_fap (float, optional): skip the searches and injections if the
+            coarse LS peak FAP exceeds this value. Defaults to None (no prescreen).
+        catalog_entry (dict, optional): pre-loaded SPORES catalog entry. Defaults to None.
+    """
+    logger.info('RAPHS: (R)adial velocity (A)nalysis of (P)otential (H)WO (S)tars')
+    logger.info('LOG ' + datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    logger.info(star)
+    logger.info('\n---------------------------\n')
+
+    try:
+        # load data and save CSVs
+        logger.info('Loading data...')
+        data = StarData(star, data_dir=data_dir, catalog_entry=catalog_entry)
+        
+        # data files are read on first access, so do it here to catch bad files
+        data.rv_data
+        data.S_index_data
+    except Exception:
+        logger.exception('Exception occurred!')
+        return
+
+    if data.rv_data is None:
+        logger.info('\nNO DATA. SKIPPING TO NEXT TARGET.')
+        return
+    else:
+        # save data to csv files
+        data.rv_data.to_csv(out_subdir + '/rvs.csv')
+        data.S_index_data.to_csv(out_subdir + '/sinds.csv')
+
+    # per-star constants reused below
+    mstar = float(data.catalog_entry['sed_grav_mass'])
+    jd = data.rv_data['jd'].to_numpy()
+    n_epochs = jd.size
+    baseline = jd.max() - jd.min()
+    logger.info(f'{n_epochs} RVs over a {baseline:.1f} day baseline')
+
+    # check for number of data points
+    if n_epochs < 25:
+        logger.info('\nNUMBER OF RVS < 25. SKIPPING TO NEXT TARGET.')
+        return
+
+    # cheap check for any significant periodic signal
+    if prescreen_fap is not None:
+        fap = coarse_peak_fap(
+            jd,
+            data.rv_data['mnvel'].to_numpy(),
+            data.rv_data['errvel'].to_numpy(),
+            min_per=3,
+            max_per=baseline
+        )
+        logger.info(f'Coarse LS peak FAP = {fap:.3g}')
+        if fap > prescreen_fap:
+            logger.info('\nNO SIGNIFICANT PERIODICITY. SKIPPING SEARCHES.')
+            do_search = inj_rec = sind = False
+
+    # per-star setup shared by the RV and S-index searches
+    ctx = build_search_context(data)
+
+    try:
+        if do_search:
+            # run search
+            logger.info(f'\nSearching RVs...')
+            rv_search_obj = search_rvs(
+                data=data,
+                output_dir=out_subdir,
+                ctx=ctx,
+                fap=0.001,
+                crit='bic',
+                max_planets=8,
+                min_per=3,
+                workers=nproc,
+                mcmc=mcmc,
+                verbose=True
+            )
+    except Exception:
+        logger.exception('Exception occurred!')
+
+    try:
+        # run injection and recovery
+        if inj_rec:
+            logger.info(f'\nRunning injections...')
+            _ = run_injrec(
+                search_path=out_subdir + '/RV_search',
+                searches=rv_search_obj,
+                mstar=mstar,
+                workers=nproc,
+                plim=(3.1, 1e6),
+                klim=(0.1, 1000.0),
+                elim=(0.0, 0.9),
+                num_sim=5000,
+                full_grid=False,
+                beta_e=True
+            )
+    except Exception:
+        logger.exception('Exception occurred!')
+
+    try:
+        # s-index analysis
+        if sind:
+            logger.info(f'\nSearching S values...')
+            _ = search_sinds(
+                data=data,
+                output_dir=out_subdir,
+                ctx=ctx,
+                fap=0.001,
+                crit='bic',
+                max_planets=8,
+                min_per=3,
+                workers=nproc,
+                mcmc=False,
+                verbose=True
+            )
+    except Exception:
+        logger.exception('Exception occurred!')
+
+    try:
+        # make LS periodograms
+        logger.info(f'\nComputing LS periodograms...')
+        lsp = LSPeriodogram(data, out_subdir)
+        lsp.plot_lsps()
+    except Exception:
+        logger.exception('Exception occurred!')
+
+    logger.info(f'\nDONE.')
+
+    return
+
 
 class Driver():
     """Main driver class to conduct RV analyses
@@ -27,13 +276,13 @@ class Driver():
     """
     def __init__(self, target_list : list = sample_stars) -> None:
         """__init__
-        
+
         """
         self.target_list = target_list
-        
+
         pass
-    
-    
+
+
     def do_everything(self,
             data_dir : str = '../data/',
             out_dir : str = 'OUT',
@@ -42,120 +291,74 @@ class Driver():
             mcmc : bool = True,
             sind : bool = True,
             nproc : int = 64,
+            prescreen_fap : float = None,
         ) -> None:
         """Run everything
 
+        Stars are processed in parallel, with the available cores split
+        between concurrent stars (outer) and each star's search and
+        injection/recovery workers (inner).
+
+        If prescreen_fap is set, stars whose coarse LS periodogram has no peak
+        with FAP below it skip the searches and injections and only get
+        periodogram plots.
+
         """
-        stdout_ = sys.stdout
-        
+        # read the catalog once and hand each star its own entry
+        catalog_df = load_catalog(data_dir)
+        catalog_df = catalog_df[catalog_df['hd_name'].isin(self.target_list)].drop_duplicates('hd_name')
+        catalog_entries = {row['hd_name'] : row for row in catalog_df.to_dict('records')}
+
+        # set up output dirs before dispatching workers
         for star in self.target_list:
-            
-            # set up output dir
-            out_subdir = f'{out_dir}/{star}'
-            if not os.path.exists(out_subdir):
-                os.makedirs(out_subdir)
-                
-            with open(out_subdir + '/log.txt', 'w') as f:
-                # start log file
-                sys.stdout = f
-                print('RAPHS: (R)adial velocity (A)nalysis of (P)otential (H)WO (S)tars')
-                print('LOG ' + datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
-                print(star)
-                print('\n---------------------------\n')
-                
-                try:
-                    # load data and save CSVs
-                    print('Loading data...')
-                    data = StarData(star, data_dir=data_dir)
-                except Exception:
-                    print('Exception occurred!')
-                    print(traceback.format_exc())
-                
-                if data.rv_data is None:
-                    print('\nNO DATA. SKIPPING TO NEXT TARGET.')
-                    sys.stdout = stdout_
-                    continue
-                else:
-                    # save data to csv files
-                    data.rv_data.to_csv(out_subdir + '/rvs.csv')
-                    data.S_index_data.to_csv(out_subdir + '/sinds.csv')
-                
-                # check for number of data points
-                if len(data.rv_data) < 25:
-                    print('\nNUMBER OF RVS < 25. SKIPPING TO NEXT TARGET.')
-                    sys.stdout = stdout_
-                    continue
-                
-                try:
-                    if do_search:
-                        # run search
-                        print(f'\nSearching RVs...')
-                        rv_search_obj = search_rvs(
-                            data=data,
-                            output_dir=out_subdir,
-                            fap=0.001,
-                            crit='bic',
-                            max_planets=8,
-                            min_per=3,
-                            workers=nproc, 
-                            mcmc=mcmc, 
-                            verbose=True
-                        )
-                except Exception:
-                    print('Exception occurred!')
-                    print(traceback.format_exc())
-                    
-                try:
-                    # run injection and recovery
-                    if inj_rec:
-                        print(f'\nRunning injections...')
-                        _ = run_injrec(
-                            search_path=out_subdir + '/RV_search',
-                            searches=rv_search_obj,
-                            mstar=data.catalog_entry['sed_grav_mass'],
-                            workers=nproc,
-                            plim=(3.1, 1e6),
-                            klim=(0.1, 1000.0),
-                            elim=(0.0, 0.9),
-                            num_sim=5000,
-                            full_grid=False,
-                            beta_e=True
-                        )
-                except Exception:
-                    print('Exception occurred!')
-                    print(traceback.format_exc())
-                        
-                try:
-                    # s-index analysis
-                    if sind:
-                        print(f'\nSearching S values...')
-                        _ = search_sinds(
-                            data=data,
-                            output_dir=out_subdir,
-                            fap=0.001,
-                            crit='bic',
-                            max_planets=8,
-                            min_per=3,
-                            workers=nproc, 
-                            mcmc=False, 
-                            verbose=True
-                        )
-                except Exception:
-                    print('Exception occurred!')
-                    print(traceback.format_exc())
-                    
-                try:
-                    # make LS periodograms
-                    print(f'\nComputing LS periodograms...')
-                    lsp = LSPeriodogram(data, out_subdir)
-                    lsp.plot_lsps()
-                except Exception:
-                    print('Exception occurred!')
-                    print(traceback.format_exc())
-                
-                print(f'\nDONE.')
-                
-                sys.stdout = stdout_
+            os.makedirs(f'{out_dir}/{star}', exist_ok=True)
 
-        
-        
\ No newline at end of file
+        # split cores between stars and per-star workers
+        outer = max(1, min(len(self.target_list), nproc))
+        inner = max(1, nproc // outer)
+
+        worker = partial(
+            _process_star,
+            data_dir=data_dir,
+            out_dir=out_dir,
+            do_search=do_search,
+            inj_rec=inj_rec,
+            mcmc=mcmc,
+            sind=sind,
+            nproc=inner,
+            prescreen_fap=prescreen_fap,
+        )
+
+        # stream worker log records to the console
+        log_queue = Queue()
+        console = logging.StreamHandler()
+        console.setFormatter(logging.Formatter('%(name)s: %(message)s'))
+        listener = QueueListener(log_queue, console)
+        listener.start()
+
+        # failures of whole worker tasks are reported the same way
+        batch_logger = logging.getLogger('raphs.driver.batch')
+        batch_handler = QueueHandler(log_queue)
+        batch_logger.addHandler(batch_handler)
+        batch_logger.propagate = False
+
+        try:
+            with ProcessPoolExecutor(
+                max_workers=outer,
+                initializer=_init_worker,
+                initargs=(inner, log_queue)
+            ) as ex:
+                futures = [
+                    ex.submit(worker, star, catalog_entry=catalog_entries.get(star))
+                    for star in self.target_list
+                ]
+                for star, future in zip(self.target_list, futures):
+                    try:
+                        future.result()
+                    except Exception:
+                        batch_logger.exception(f'{star}: exception occurred!')
+        finally:
+            batch_logger.removeHandler(batch_handler)
+            listener.stop()
+
+        return
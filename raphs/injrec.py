@@ -1,45 +1,283 @@
+import os
+import copy
+import zlib
+import pickle
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
+import matplotlib.pyplot as plt
+from scipy.stats import beta
 from rvsearch.search import Search
 from rvsearch.inject import Injections, Completeness
 from rvsearch.plots import CompletenessPlots
 
+
+# Beta distribution parameters for eccentricities (Kipping 2013)
+BETA_E_A = 0.867
+BETA_E_B = 3.03
+
+# injected parameters identifying an injection, and their rounding
+INJ_KEY_COLS = ['inj_period', 'inj_k', 'inj_e']
+INJ_KEY_DECIMALS = 8
+
+# injection/recovery output columns, as written by rvsearch
+INJ_COLS = ['inj_period', 'inj_tp', 'inj_e', 'inj_w', 'inj_k']
+REC_COLS = ['rec_period', 'rec_tp', 'rec_e', 'rec_w', 'rec_k']
+RECOVERIES_COLS = INJ_COLS + REC_COLS + ['recovered', 'bic', 'bic_thresh']
+
+# per-process Search object, unpickled once by _init_worker
+_worker_search = None
+
+
+def _init_worker(search_pkl : str) -> None:
+    """Initialize an injection/recovery worker process
+
+    Unpickles the search object once per worker rather than once per injection.
+
+    Args:
+        search_pkl (str): path to search object pickle file
+    """
+    global _worker_search
+    with open(search_pkl, 'rb') as f:
+        _worker_search = pickle.load(f)
+    _worker_search.verbose = False
+
+    return
+
+
+def _run_chunk(chunk : np.recarray) -> pd.DataFrame:
+    """Run injection and recovery on a contiguous chunk of the injection grid
+
+    Each injection runs on a fresh copy of the worker's search object, since
+    inject_recover modifies the search it is called on.
+
+    Args:
+        chunk (np.recarray): injected planet parameters
+
+    Returns:
+        pd.DataFrame: recoveries for this chunk
+    """
+    injected = pd.DataFrame.from_records(chunk)[INJ_COLS]
+
+    rows = []
+    for orbel in injected.to_numpy():
+        search = copy.deepcopy(_worker_search)
+        recovered, recovered_orbel = search.inject_recover(orbel, num_cpus=1)
+        rows.append([*recovered_orbel, recovered, search.best_bics[-1], search.bic_threshes[-1]])
+
+    recoveries = pd.DataFrame(rows, columns=RECOVERIES_COLS[len(INJ_COLS):])
+
+    return pd.concat([injected.reset_index(drop=True), recoveries], axis=1)
+
+
+def _injection_keys(df : pd.DataFrame) -> pd.MultiIndex:
+    """Keys identifying injections by their (rounded) parameters
+
+    Args:
+        df (pd.DataFrame): injected planets or recoveries
+
+    Returns:
+        pd.MultiIndex: one key per row
+    """
+    return pd.MultiIndex.from_frame(df[INJ_KEY_COLS].round(INJ_KEY_DECIMALS))
+
+
+def _injection_fingerprint(
+    search_pkl : str,
+    seed : int,
+    inj_kwargs : dict,
+    ) -> str:
+    """Hash identifying an injection/recovery run
+
+    Args:
+        search_pkl (str): path to search object pickle file
+        seed (int): seed for the injection grid
+        inj_kwargs (dict): keyword args passed to rvsearch Injections class
+
+    Returns:
+        str: hex digest
+    """
+    h = hashlib.sha1()
+    with open(search_pkl, 'rb') as f:
+        for block in iter(lambda: f.read(2**20), b''):
+            h.update(block)
+    h.update(repr((seed, sorted(inj_kwargs.items()))).encode())
+
+    return h.hexdigest()
+
+
+def draw_beta_eccentricities(
+    rng : np.random.Generator,
+    size : int,
+    elim : tuple = (0.0, 1.0),
+    ) -> np.ndarray:
+    """Draw eccentricities from a Beta distribution truncated to elim
+
+    Uses inverse-CDF sampling, so exactly `size` values are drawn in a single
+    vectorized call with no rejection step.
+
+    Args:
+        rng (np.random.Generator): random number generator
+        size (int): number of eccentricities to draw
+        elim (tuple, optional): lower and upper eccentricity bounds. Defaults to (0.0, 1.0).
+
+    Returns:
+        np.ndarray: eccentricities
+    """
+    cdf_lo, cdf_hi = beta.cdf(elim, BETA_E_A, BETA_E_B)
+    u = rng.uniform(cdf_lo, cdf_hi, size=size)
+
+    return beta.ppf(u, BETA_E_A, BETA_E_B)
+
+
+def draw_injection_grid(
+    rng : np.random.Generator,
+    num_sim : int,
+    plim : tuple,
+    klim : tuple,
+    elim : tuple,
+    beta_e : bool = False,
+    ) -> pd.DataFrame:
+    """Draw random injected planet parameters
+
+    Periods and semi-amplitudes are log-uniform, eccentricities are uniform
+    (or Beta-distributed if beta_e), and time of periastron and argument of
+    periastron are uniform over one orbit.
+
+    Args:
+        rng (np.random.Generator): random number generator
+        num_sim (int): number of planets to draw
+        plim (tuple): lower and upper period bounds
+        klim (tuple): lower and upper semi-amplitude bounds
+        elim (tuple): lower and upper eccentricity bounds
+        beta_e (bool, optional): draw eccentricities from a Beta distribution. Defaults to False.
+
+    Returns:
+        pd.DataFrame: injected planets (inj_period, inj_tp, inj_e, inj_w, inj_k)
+    """
+    per = 10**rng.uniform(np.log10(plim[0]), np.log10(plim[1]), num_sim)
+    k = 10**rng.uniform(np.log10(klim[0]), np.log10(klim[1]), num_sim)
+    if beta_e:
+        e = draw_beta_eccentricities(rng, num_sim, elim=elim)
+    else:
+        e = rng.uniform(elim[0], elim[1], num_sim)
+    tp = rng.uniform(0, per)
+    w = rng.uniform(0, 2*np.pi, num_sim)
+
+    return pd.DataFrame(dict(inj_period=per, inj_tp=tp, inj_e=e, inj_w=w, inj_k=k))
+
+
 def run_injrec(
     search_path : str,
     searches : Search,
     mstar : float,
     workers : int,
+    seed : int = None,
     **inj_kwargs
     ) -> pd.DataFrame:
     """Run injection and recovery simulations
 
+    Finished injections are appended to recoveries_partial.csv as they
+    complete, so an interrupted run resumes where it stopped. The partial
+    file is only reused if recoveries_partial.sha1 matches the search
+    pickle, seed, and inj_kwargs of this run, and both are removed once
+    recoveries.csv is written.
+
     Args:
         search_path (str): path to search object pickle file
         searches (Search): rvsearch Search object with found planets
         mstar (float): stellar mass in solar units
         workers (int): number of cores for inj/rec tests
+        seed (int, optional): seed for the injection grid. Defaults to None (derived from the star name).
         **inj_kwargs: keyword args to pass to rvsearch Injections class
 
     Returns:
         pd.DataFrame: recoveries
     """
+    search_pkl = f'{search_path}/search.pkl'
+
     # instantiate Injections class
-    inj = Injections(f'{search_path}/search.pkl', **inj_kwargs)
-    
-    # run injections
-    recoveries = inj.run_injections(num_cpus=workers)
+    inj = Injections(search_pkl, **inj_kwargs)
+
+    # draw a reproducible random injection grid
+    if not inj_kwargs.get('full_grid', True):
+        if seed is None:
+            seed = zlib.crc32(searches.starname.encode())
+        inj.injected_planets = draw_injection_grid(
+            np.random.default_rng(seed),
+            inj_kwargs.get('num_sim', 1),
+            plim=inj_kwargs['plim'],
+            klim=inj_kwargs['klim'],
+            elim=inj_kwargs['elim'],
+            beta_e=inj_kwargs.get('beta_e', False)
+        )
+
+    # resume from injections completed by an interrupted run of the same setup
+    partial_fn = f'{search_path}/recoveries_partial.csv'
+    fingerprint_fn = f'{search_path}/recoveries_partial.sha1'
+    fingerprint = _injection_fingerprint(search_pkl, seed, inj_kwargs)
+    grid_df = inj.injected_planets
+    parts = []
+    resume = False
+    if os.path.exists(partial_fn) and os.path.exists(fingerprint_fn):
+        with open(fingerprint_fn) as f:
+            resume = f.read().strip() == fingerprint
+    if resume:
+        done_df = pd.read_csv(partial_fn)
+        parts.append(done_df)
+        grid_df = grid_df[~_injection_keys(grid_df).isin(_injection_keys(done_df))]
+    else:
+        # start over, discarding results of a different setup
+        if os.path.exists(partial_fn):
+            os.remove(partial_fn)
+        with open(fingerprint_fn, 'w') as f:
+            f.write(fingerprint)
+
+    # split the remaining injection grid into contiguous chunks
+    grid = grid_df.to_records(index=False)
+    n_chunks = min(len(grid), workers * 4)
+    chunks = np.array_split(grid, n_chunks) if n_chunks > 0 else []
+
+    # run injections, appending each finished chunk to the partial file
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(search_pkl,)
+    ) as ex:
+        for chunk_recoveries in ex.map(_run_chunk, chunks):
+            chunk_recoveries.to_csv(
+                partial_fn,
+                mode='a',
+                header=not os.path.exists(partial_fn),
+                index=False
+            )
+            parts.append(chunk_recoveries)
+
+    if parts:
+        recoveries = pd.concat(parts, ignore_index=True)
+    else:
+        recoveries = pd.DataFrame(columns=RECOVERIES_COLS)
+    inj.recoveries = recoveries
     recoveries.to_csv(f'{search_path}/recoveries.csv', index=False)
-        
+    for fn in [partial_fn, fingerprint_fn]:
+        if os.path.exists(fn):
+            os.remove(fn)
+
+    # nothing to plot
+    if len(recoveries) == 0:
+        return recoveries
+
     # plot completeness
     comp = Completeness(recoveries, mstar=mstar)
     cp = CompletenessPlots(comp, searches=[searches])
     fig = cp.completeness_plot(
-        xlabel='$a$ [AU]', 
+        xlabel='$a$ [AU]',
         ylabel=r'M$\sin{i}$ [M$_{\oplus}$]',
         title=searches.starname
     )
     fig.savefig(f'{search_path}/{searches.starname}_recoveries.pdf')
-    
+    plt.close(fig)
+
     return recoveries
-    
-    
-    
\ No newline at end of file
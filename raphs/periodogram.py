@@ -1,3 +1,7 @@
+import os
+import hashlib
+from functools import lru_cache
+
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
@@ -7,6 +11,327 @@ from astropy.timeseries import LombScargle
 from .stardata import StarData
 
 
+# Lomb-Scargle backend: FINUFFT via nifty-ls if installed (it registers the
+# 'fastnifty' method with astropy), else astropy's extirpolation + FFT.
+# Below DIRECT_MAX_N points the direct sums beat the astropy FFT overhead.
+try:
+    import nifty_ls
+    from nifty_ls.core import AVAILABLE_BACKENDS as NIFTY_BACKENDS
+    LS_METHOD = 'fastnifty'
+    DIRECT_MAX_N = 0
+except ImportError:
+    nifty_ls = None
+    NIFTY_BACKENDS = []
+    LS_METHOD = 'fast'
+    DIRECT_MAX_N = 32
+
+# GPU NUFFT (cufinufft + cupy), only used when asked for: stars are already
+# processed in parallel and would otherwise all contend for the same device
+GPU_AVAILABLE = 'cufinufft' in NIFTY_BACKENDS
+
+# bump when the grid or power computation changes, to invalidate cached periodograms
+LSP_CACHE_VERSION = 3
+
+
+def _frequency_grid(
+    min_per : float,
+    max_per : float,
+    delta_f : float,
+    ) -> np.ndarray:
+    """Build a regular frequency grid with a power-of-two length
+
+    The fast LS method pads its FFTs to a power of two anyway, so rounding
+    the number of frequencies up costs nothing and keeps the spacing at or
+    below delta_f.
+
+    Args:
+        min_per (float): minimum period
+        max_per (float): maximum period
+        delta_f (float): maximum frequency grid spacing
+
+    Returns:
+        np.ndarray: frequency grid
+    """
+    f_min = 1/max_per
+    f_max = 1/min_per
+    # n_f points span n_f - 1 intervals
+    n_f = 2**int(np.ceil(np.log2((f_max - f_min) / delta_f + 1)))
+
+    return np.linspace(f_min, f_max, n_f)
+
+
+def _ls_power_direct(
+    t : np.ndarray,
+    y : np.ndarray,
+    dy : np.ndarray,
+    frequency : np.ndarray,
+    fit_mean : bool = True,
+    center_data : bool = True,
+    block_size : int = 2**22,
+    ) -> np.ndarray:
+    """Evaluate Lomb-Scargle power by direct trig sums
+
+    Generalized LS (Zechmeister & Kurster 2009) with standard normalization.
+    The trig sums are evaluated as complex matrix-vector products,
+    exp(i w t) @ w and exp(2i w t) @ w, over blocks of frequencies.
+
+    Args:
+        t (np.ndarray): observation times
+        y (np.ndarray): observed values
+        dy (np.ndarray): uncertainties (or None)
+        frequency (np.ndarray): frequency grid
+        fit_mean (bool, optional): fit a floating mean. Defaults to True.
+        center_data (bool, optional): subtract the weighted mean. Defaults to True.
+        block_size (int, optional): max elements per block of exponentials. Defaults to 2**22.
+
+    Returns:
+        np.ndarray: power
+    """
+    t = np.asarray(t, dtype=float)
+    y = np.asarray(y, dtype=float)
+    w = np.ones_like(t) if dy is None else np.asarray(dy, dtype=float)**-2.
+    w = w / w.sum()
+
+    # with centered data the mean terms of YC, YS vanish
+    if center_data or fit_mean:
+        y = y - w @ y
+    YY = w @ y**2
+    wy = w * y
+
+    omega = 2 * np.pi * np.asarray(frequency)
+    power = np.empty(len(omega))
+    step = max(1, block_size // len(t))
+    for i in range(0, len(omega), step):
+        E = np.exp(1j * np.outer(omega[i:i+step], t))
+        YC_YS = E @ wy
+        C_S = E @ w
+        C2_S2 = (E * E) @ w
+
+        YC, YS = YC_YS.real, YC_YS.imag
+        CC = 0.5 * (1 + C2_S2.real)
+        SS = 0.5 * (1 - C2_S2.real)
+        CS = 0.5 * C2_S2.imag
+        if fit_mean:
+            C, S = C_S.real, C_S.imag
+            CC -= C * C
+            SS -= S * S
+            CS -= C * S
+
+        D = CC * SS - CS * CS
+        power[i:i+step] = (SS * YC**2 + CC * YS**2 - 2 * CS * YC * YS) / (YY * D)
+
+    return power
+
+
+def _ls_power(
+    t : np.ndarray,
+    y : np.ndarray,
+    dy : np.ndarray,
+    frequency : np.ndarray,
+    **ls_kwargs
+    ) -> np.ndarray:
+    """Evaluate Lomb-Scargle power on a regular frequency grid
+
+    Args:
+        t (np.ndarray): observation times
+        y (np.ndarray): observed values
+        dy (np.ndarray): uncertainties (or None)
+        frequency (np.ndarray): regularly spaced frequency grid
+        **ls_kwargs: keyword args to pass to astropy LombScargle
+
+    Returns:
+        np.ndarray: power
+    """
+    if len(t) <= DIRECT_MAX_N:
+        return _ls_power_direct(t, y, dy, frequency, **ls_kwargs)
+
+    return LombScargle(t, y, dy, **ls_kwargs).power(
+        frequency,
+        method=LS_METHOD,
+        assume_regular_frequency=True
+    )
+
+
+def _instrument_masks(
+    tel : pd.Series,
+    tels : np.ndarray,
+    ) -> np.ndarray:
+    """Boolean masks selecting all data and then each instrument
+
+    The instrument labels are factorized once into integer codes, and all
+    masks come from a single broadcast comparison.
+
+    Args:
+        tel (pd.Series): instrument label for each observation
+        tels (np.ndarray): instruments, in output row order
+
+    Returns:
+        np.ndarray: masks, shape (1 + len(tels), len(tel))
+    """
+    codes = pd.Categorical(tel, categories=tels).codes
+    masks = codes == np.arange(len(tels))[:, None]
+
+    return np.vstack([np.ones(len(codes), dtype=bool), masks])
+
+
+def _masked_rows(
+    y : np.ndarray,
+    dy : np.ndarray,
+    use : np.ndarray,
+    ) -> tuple:
+    """Per-series values and uncertainties for _ls_power_batch
+
+    Points outside a series, or with a non-finite value or uncertainty, get
+    zero value and infinite uncertainty, so they cannot leak NaNs into the
+    other series of a batch.
+
+    Args:
+        y (np.ndarray): observed values
+        dy (np.ndarray): uncertainties
+        use (np.ndarray): boolean masks selecting each series, shape (n_series, n_obs)
+
+    Returns:
+        tuple: values and uncertainties, each of shape (n_series, n_obs)
+    """
+    use = use & np.isfinite(y) & np.isfinite(dy)
+
+    return np.where(use, y, 0.), np.where(use, dy, np.inf)
+
+
+def _ls_backend(use_gpu : bool = False) -> str:
+    """Name of the backend used by _ls_power_batch
+
+    Args:
+        use_gpu (bool, optional): GPU requested. Defaults to False.
+
+    Returns:
+        str: nifty-ls backend, or the astropy method
+    """
+    if nifty_ls is None:
+        return f'astropy-{LS_METHOD}'
+
+    return 'cufinufft' if use_gpu and GPU_AVAILABLE else 'finufft'
+
+
+def _ls_power_batch(
+    t : np.ndarray,
+    y : np.ndarray,
+    dy : np.ndarray,
+    frequency : np.ndarray,
+    use_gpu : bool = False,
+    **ls_kwargs
+    ) -> np.ndarray:
+    """Evaluate several Lomb-Scargle periodograms sharing times and frequencies
+
+    Each row of y/dy is one series. Points with infinite uncertainty get zero
+    weight, so subsets of the data (e.g. one instrument) are expressed as rows
+    over the full time array. With nifty-ls all rows are computed in a single
+    batched NUFFT call; otherwise each row is evaluated separately.
+
+    Args:
+        t (np.ndarray): observation times, sorted
+        y (np.ndarray): observed values, shape (n_series, n_obs)
+        dy (np.ndarray): uncertainties, shape (n_series, n_obs)
+        frequency (np.ndarray): regularly spaced frequency grid
+        use_gpu (bool, optional): use the cufinufft backend if available. Defaults to False.
+        **ls_kwargs: keyword args to pass to LombScargle (fit_mean, center_data)
+
+    Returns:
+        np.ndarray: power, shape (n_series, n_frequencies)
+    """
+    if nifty_ls is not None:
+        # results are copied back to host memory by nifty-ls
+        return nifty_ls.lombscargle(
+            t, y, dy,
+            fmin=frequency[0],
+            fmax=frequency[-1],
+            Nf=len(frequency),
+            backend=_ls_backend(use_gpu),
+            **ls_kwargs
+        ).power
+
+    power = np.empty((len(y), len(frequency)))
+    for i in range(len(y)):
+        use = np.isfinite(dy[i])
+        power[i] = _ls_power(t[use], y[i, use], dy[i, use], frequency, **ls_kwargs)
+
+    return power
+
+
+def coarse_peak_fap(
+    t : np.ndarray,
+    y : np.ndarray,
+    dy : np.ndarray,
+    min_per : float,
+    max_per : float,
+    ) -> float:
+    """False alarm probability of the highest peak in a coarse LS periodogram
+
+    Cheap pre-check for whether a time series contains any significant
+    periodic signal: one sample per peak, fast method, Baluev (2008) FAP.
+
+    Args:
+        t (np.ndarray): observation times
+        y (np.ndarray): observed values
+        dy (np.ndarray): uncertainties
+        min_per (float): minimum period
+        max_per (float): maximum period
+
+    Returns:
+        float: FAP of the highest peak
+    """
+    grid_kwargs = dict(
+        minimum_frequency=1/max_per,
+        maximum_frequency=1/min_per,
+        samples_per_peak=1
+    )
+    ls = LombScargle(t, y, dy)
+    _, power = ls.autopower(method=LS_METHOD, **grid_kwargs)
+
+    return ls.false_alarm_probability(power.max(), method='baluev', **grid_kwargs)
+
+
+def _lsp_cache_key(
+    rvs : pd.DataFrame,
+    svals : pd.DataFrame,
+    *params
+    ) -> str:
+    """Short hash identifying a set of periodogram inputs
+
+    Args:
+        rvs (pd.DataFrame): RV data
+        svals (pd.DataFrame): S-index data
+        *params: periodogram settings (grid, combined rows, ...)
+
+    Returns:
+        str: hex digest
+    """
+    h = hashlib.sha1()
+    h.update(f'v{LSP_CACHE_VERSION}'.encode())
+    h.update(pd.util.hash_pandas_object(rvs, index=False).to_numpy().tobytes())
+    h.update(pd.util.hash_pandas_object(svals, index=False).to_numpy().tobytes())
+    h.update(repr(params).encode())
+
+    return h.hexdigest()[:12]
+
+
+@lru_cache(maxsize=4)
+def _load_post(
+    path : str,
+    mtime : float,
+    ) -> posterior.Posterior:
+    """Load a radvel posterior, cached on its path and modification time
+
+    Args:
+        path (str): path to posterior pickle file
+        mtime (float): file modification time, so a rewritten file is reloaded
+
+    Returns:
+        posterior.Posterior: radvel posterior
+    """
+    return posterior.load(path)
+
+
 class LSPeriodogram():
     """Object for Lomb-Scargle periodograms
 
@@ -26,21 +351,63 @@ class LSPeriodogram():
         self.data = data
         self.output_dir = output_dir
         self.bin_size = bin_size
-        self.tels = np.unique(data.rv_data['tel'].values)
+        self.tels = np.unique(data.rv_data['tel'].to_numpy())
         self.lsp_dict = None
         
         pass
-    
-    
+
+
+    @staticmethod
+    def warmup(
+        n_est : int = 100,
+        min_per : float = 3.1,
+        delta_f : float = 1e-5,
+        baseline : float = 7000.,
+        ) -> None:
+        """Prime the LS backend before a batch of stars.
+
+        astropy's fast method pads its transforms to a power of two and
+        NumPy's pocketfft caches plans by transform length, so one throwaway
+        call lets similar-sized periodograms reuse them. With nifty-ls this
+        pays the one-time FINUFFT/thread-pool start-up cost instead.
+
+        Args:
+            n_est (int, optional): typical number of observations. Defaults to 100.
+            min_per (float, optional): minimum period. Defaults to 3.1.
+            delta_f (float, optional): frequency grid spacing. Defaults to 1e-5.
+            baseline (float, optional): typical time baseline in days. Defaults to 7000.
+        """
+        t = np.linspace(0., baseline, n_est)
+        f = _frequency_grid(min_per, 1.5 * baseline, delta_f)
+        _ls_power(t, np.sin(t), None, f)
+
+        return
+
+
     def compute_lsps(self,
         min_per : float = 3.1,
         delta_f : float = 1e-5,
+        use_gpu : bool = False,
+        include_combined : bool = True,
+        cache : bool = False,
+        force : bool = False,
         ) -> dict:
         """Compute LS periodograms for the data.
+        
+        With cache, results are saved in output_dir as .lsp_cache_<hash>.npz,
+        keyed on the data, grid settings, and backend, and reloaded on later
+        calls. Only the latest cache file is kept, and failing to write it is
+        not an error.
 
         Args:
             min_per (float, optional): minimum period. Defaults to 1.
             delta_f (float, optional): frequency grid spacing. Defaults to 1e-6.
+            use_gpu (bool, optional): compute on the GPU (cufinufft) if available,
+                else fall back to the CPU. Defaults to False.
+            include_combined (bool, optional): also compute the periodograms of
+                all instruments combined ('all'). Defaults to True.
+            cache (bool, optional): reuse and save cached periodograms. Defaults to False.
+            force (bool, optional): recompute even if cached. Defaults to False.
 
         Returns:
             dict: lsp_dict
@@ -48,47 +415,120 @@ class LSPeriodogram():
         rvs = self.data.rv_data
         svals = self.data.S_index_data
         
-        max_per = 1.5 * np.ptp(rvs['jd'])
-        f = np.arange(1/max_per, 1/min_per, delta_f)
+        # reuse periodograms cached by an earlier call on the same inputs
+        if cache:
+            cache_key = _lsp_cache_key(rvs, svals, min_per, delta_f, include_combined, _ls_backend(use_gpu))
+            cache_fn = f'{self.output_dir}/.lsp_cache_{cache_key}.npz'
+        if cache and not force and os.path.exists(cache_fn):
+            lsp_dict = dict()
+            with np.load(cache_fn) as npz:
+                for name in npz.files:
+                    key, field = name.split('/')
+                    lsp_dict.setdefault(key, dict())[field] = npz[name]
+            self.lsp_dict = lsp_dict
+            
+            return lsp_dict
+        
+        # NUFFT spreading is most cache-friendly on time-sorted input, which
+        # nifty-ls assumes; StarData already sorts, so this is usually a no-op
+        if not rvs['jd'].is_monotonic_increasing:
+            rvs = rvs.sort_values('jd', kind='stable')
+        if not svals['jd'].is_monotonic_increasing:
+            svals = svals.sort_values('jd', kind='stable')
+        
+        # row 0 is the combined data, then one row per instrument;
+        # other instruments' points get zero weight (infinite uncertainty)
+        rv_jd = rvs['jd'].to_numpy()
+        rv_use = _instrument_masks(rvs['tel'], self.tels)
+        sval_use = _instrument_masks(svals['tel'], self.tels)
+        
+        # RV baseline of each row
+        rv_jd_use = np.where(rv_use, rv_jd, np.nan)
+        spans = np.nanmax(rv_jd_use, axis=1) - np.nanmin(rv_jd_use, axis=1)
+        
+        # one shared grid over the full baseline
+        f = _frequency_grid(min_per, 1.5 * spans[0], delta_f)
+        
+        # skip the combined row if not needed
+        r0 = 0 if include_combined else 1
+        rv_use, sval_use = rv_use[r0:], sval_use[r0:]
+        
+        # power is only plotted and thresholded, so it is stored as float32;
+        # frequencies stay float64
+        
+        # RVs
+        rv_power = _ls_power_batch(
+            rv_jd,
+            *_masked_rows(rvs['mnvel'].to_numpy(), rvs['errvel'].to_numpy(), rv_use),
+            f,
+            use_gpu=use_gpu
+        ).astype(np.float32)
+        
+        # S index values
+        sval_power = _ls_power_batch(
+            svals['jd'].to_numpy(),
+            *_masked_rows(svals['sind'].to_numpy(), svals['errs'].to_numpy(), sval_use),
+            f,
+            use_gpu=use_gpu
+        ).astype(np.float32)
+        
+        # window functions
+        windowfn_power = _ls_power_batch(
+            rv_jd,
+            np.ones(rv_use[1-r0:].shape),
+            np.where(rv_use[1-r0:], 1., np.inf),
+            f,
+            use_gpu=use_gpu,
+            fit_mean=False, center_data=False
+        ).astype(np.float32)
         
         # combined data sets
-        lsp_dict = dict(all=dict(frequency=f))
-        lsp_dict['all']['rv_power'] = LombScargle(rvs['jd'], rvs['mnvel'], rvs['errvel']).power(f)
-        lsp_dict['all']['sval_power'] = LombScargle(svals['jd'], svals['sind'], svals['errs']).power(f)
-        
-        # individual instruments
-        for tel in self.tels:
-            # frequencies
-            max_per = 1.5 * np.ptp(rvs.loc[rvs['tel'] == tel, 'jd'])
-            f = np.arange(1/max_per, 1/min_per, delta_f)
-            lsp_dict[tel] = dict(frequency=f)
-            
-            # RVs
-            lsp_dict[tel]['rv_power'] = LombScargle(
-                rvs.loc[rvs['tel'] == tel, 'jd'],
-                rvs.loc[rvs['tel'] == tel, 'mnvel'],
-                rvs.loc[rvs['tel'] == tel, 'errvel']
-            ).power(f)
-            
-            # S index values
-            lsp_dict[tel]['sval_power'] = LombScargle(
-                svals.loc[svals['tel'] == tel, 'jd'],
-                svals.loc[svals['tel'] == tel, 'sind'],
-                svals.loc[svals['tel'] == tel, 'errs']
-            ).power(f)
-            
-            # window functions
-            lsp_dict[tel]['windowfn_power'] = LombScargle(
-                rvs.loc[rvs['tel'] == tel, 'jd'],
-                np.ones(len(rvs.loc[rvs['tel'] == tel, 'jd'])),
-                fit_mean=False, center_data=False
-            ).power(f)
+        lsp_dict = dict()
+        if include_combined:
+            lsp_dict['all'] = dict(frequency=f)
+            lsp_dict['all']['rv_power'] = rv_power[0]
+            lsp_dict['all']['sval_power'] = sval_power[0]
+        
+        # individual instruments, trimmed to their own baseline
+        for i, tel in enumerate(self.tels):
+            i_min = np.searchsorted(f, 1/(1.5 * spans[i+1]))
+            lsp_dict[tel] = dict(frequency=f[i_min:])
+            lsp_dict[tel]['rv_power'] = rv_power[i+1-r0, i_min:]
+            lsp_dict[tel]['sval_power'] = sval_power[i+1-r0, i_min:]
+            lsp_dict[tel]['windowfn_power'] = windowfn_power[i, i_min:]
         
+        if cache:
+            self._save_lsp_cache(cache_fn, lsp_dict)
         self.lsp_dict = lsp_dict
         
         return lsp_dict
         
     
+    def _save_lsp_cache(self,
+        cache_fn : str,
+        lsp_dict : dict,
+        ) -> None:
+        """Save periodograms to the cache, replacing older cache files
+
+        Args:
+            cache_fn (str): cache file name
+            lsp_dict (dict): periodograms
+        """
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            for entry in os.scandir(self.output_dir):
+                if entry.name.startswith('.lsp_cache_') and entry.name != os.path.basename(cache_fn):
+                    os.remove(entry.path)
+            np.savez_compressed(
+                cache_fn,
+                **{f'{key}/{field}' : arr for key, lsp in lsp_dict.items() for field, arr in lsp.items()}
+            )
+        except OSError as err:
+            print(f'Could not cache periodograms: {err}')
+        
+        return
+    
+    
     def get_periods_from_posterior(self):
         """Load periods form radvel posterior object
 
@@ -96,7 +536,8 @@ class LSPeriodogram():
             list: periods
         """
         try:
-            post = posterior.load(self.output_dir + '/RV_search/post_final.pkl')
+            post_fn = self.output_dir + '/RV_search/post_final.pkl'
+            post = _load_post(post_fn, os.path.getmtime(post_fn))
             param_list = post.list_params()
             
             periods = []
@@ -131,80 +572,178 @@ class LSPeriodogram():
         Returns:
             tuple: (power_thresh, fap_min)
         """
-        # sort power
-        power_sorted = np.sort(power)
+        # partial sort: only the 50th/95th percentile cuts are needed, and the
+        # order within the crop does not matter for the histogram
+        n = len(power)
+        lo, hi = int(0.5 * n), int(0.95 * n)
+        power_part = np.partition(power, [lo, hi])
         
         # crop out the 50th to 95th percentile data and save the median value
-        power_crop = power_sorted[int(0.5 * len(power_sorted)) : int(0.95 * len(power_sorted))]
-        power_med = power_crop[0]
+        power_crop = power_part[lo:hi]
+        power_med = power_part[lo]
         
         # compute the log(histogram)
         hist, edges = np.histogram(power_crop - power_med, bins=10)
         centers = (edges[1:] + edges[:-1]) / 2.
         loghist = np.log10(hist)
         
-        # fit a line
-        a, b = np.polyfit(centers[np.isfinite(loghist)], loghist[np.isfinite(loghist)], 1)
+        # fit a line (closed-form least squares)
+        finite = np.isfinite(loghist)
+        x, y = centers[finite], loghist[finite]
+        sx, sy = x.sum(), y.sum()
+        sxx, sxy = (x*x).sum(), (x*y).sum()
+        a = (x.size*sxy - sx*sy) / (x.size*sxx - sx*sx)
+        b = (sy - a*sx) / x.size
         B = 10**b
         A = -a*np.log(10)
         
         # calculate the power threshold value for the given FAP
-        power_thresh = np.log(fap / len(power)) / (-A) + power_med
+        power_thresh = np.log(fap / n) / (-A) + power_med
         
         # calculate the minimum FAP
-        fap_min = np.exp(-A * (power_sorted[-1] - power_med)) * len(power)
+        fap_min = np.exp(-A * (power.max() - power_med)) * n
         
         return (power_thresh, fap_min)
     
     
+    @staticmethod
+    def compute_fap_thresh_analytic(
+            power : np.ndarray,
+            frequency : np.ndarray,
+            fap : float,
+            n_obs : int,
+            baseline : float,
+        ) -> tuple:
+        """Calculate the analytic power threshold given some FAP value.
+        
+        Also calculates the minimum FAP value given the LS power.
+        
+        Uses the single-frequency false alarm probability of the standard
+        normalization, (1 - z)^((N - 3) / 2) (e.g. Baluev 2008), with
+        f_max * T independent frequencies (Horne & Baliunas 1986). This is
+        astropy's 'naive' method, without any sorting or fitting of the power.
+
+        Args:
+            power (np.ndarray): power array
+            frequency (np.ndarray): frequency grid
+            fap (float): FAP value
+            n_obs (int): number of observations
+            baseline (float): observing baseline
+
+        Returns:
+            tuple: (power_thresh, fap_min)
+        """
+        # effective number of independent frequencies
+        n_eff = max(frequency[-1] * baseline, 1.)
+        
+        # degrees of freedom of the single-frequency distribution
+        dof = max(n_obs - 3, 1)
+        
+        # invert the global FAP to a single-frequency FAP, then to power
+        fap_single = -np.expm1(np.log1p(-fap) / n_eff)
+        power_thresh = 1 - fap_single**(2 / dof)
+        
+        # calculate the minimum FAP
+        fap_single_min = (1 - power.max())**(0.5 * dof)
+        fap_min = -np.expm1(n_eff * np.log1p(-fap_single_min))
+        
+        return (power_thresh, fap_min)
     
     
-    def plot_lsps(self, fap=0.001, **compute_kwargs):
+    def _fap_power_thresh(self,
+            power : np.ndarray,
+            frequency : np.ndarray,
+            jd : np.ndarray,
+            fap : float,
+            fap_method : str,
+        ) -> float:
+        """Power threshold for a FAP value from the chosen method
+
+        Args:
+            power (np.ndarray): power array
+            frequency (np.ndarray): frequency grid
+            jd (np.ndarray): observation times of the series
+            fap (float): FAP value
+            fap_method (str): 'analytic' or 'empirical'
+
+        Returns:
+            float: power threshold
+        """
+        if fap_method == 'analytic':
+            return self.compute_fap_thresh_analytic(power, frequency, fap, n_obs=len(jd), baseline=np.ptp(jd))[0]
+        elif fap_method == 'empirical':
+            return self.compute_fap_thresh(power, fap=fap)[0]
+        else:
+            raise ValueError(f"fap_method must be 'analytic' or 'empirical', not {fap_method!r}")
+    
+    
+    def plot_lsps(self, fap=0.001, include_combined=True, fap_method='analytic', **compute_kwargs):
         """Plot LS periodograms
 
         Args:
             fap (float, optional): False alarm probability. Defaults to 0.001.
+            include_combined (bool, optional): also plot the periodograms of all
+                instruments combined. Defaults to True.
+            fap_method (str, optional): 'analytic' (compute_fap_thresh_analytic) or
+                'empirical' (compute_fap_thresh) FAP thresholds. Analytic thresholds
+                are not drawn on the window functions. Defaults to 'analytic'.
         """
         
         
         # compute LS periodograms
-        lsps = self.compute_lsps(**compute_kwargs)
+        lsps = self.compute_lsps(include_combined=include_combined, **compute_kwargs)
+        
+        # observation times of each series, for the FAP thresholds
+        rv_jd = self.data.rv_data['jd'].to_numpy()
+        sval_jd = self.data.S_index_data['jd'].to_numpy()
+        tel_jd = {tel : jd.to_numpy() for tel, jd in self.data.rv_data.groupby('tel', observed=True)['jd']}
+        
+        # periods for the x-axis, one array per series
+        periods = {key : 1/lsp['frequency'] for key, lsp in lsps.items()}
         
         # set up figure
+        n_combined = 1 if include_combined else 0
         fig, axes = plt.subplots(
-            int(2 * (len(self.tels) + 1)), 1,
+            int(2 * (len(self.tels) + n_combined)), 1,
             sharex=True,
             figsize=(8,10) 
         )
         axes[0].set_title(self.data.hd_name, size=18)
         
-        # all RVs
-        ax = axes[0]
-        ax.plot(1/lsps['all']['frequency'], lsps['all']['rv_power'], c='navy', lw=1, label='All RVs')
-        ax.axhline(self.compute_fap_thresh(lsps['all']['rv_power'], fap=fap)[0], ls='--', lw=1, c='firebrick', label=f'FAP = {fap}')
-        ax.axhspan(-1, self.compute_fap_thresh(lsps['all']['rv_power'], fap=fap)[0], alpha=0.1)
-        ax.legend(loc=2)
-        
-        # all S-index values
-        ax = axes[1]
-        ax.plot(1/lsps['all']['frequency'], lsps['all']['sval_power'], c='navy', lw=1, label='All S-index')
-        ax.axhline(self.compute_fap_thresh(lsps['all']['sval_power'], fap=fap)[0], ls='--', lw=1, c='firebrick')
-        ax.axhspan(-1, self.compute_fap_thresh(lsps['all']['sval_power'], fap=fap)[0], alpha=0.1)
-        ax.legend(loc=2)
+        if include_combined:
+            # all RVs
+            ax = axes[0]
+            ax.plot(periods['all'], lsps['all']['rv_power'], c='navy', lw=1, label='All RVs')
+            thresh = self._fap_power_thresh(lsps['all']['rv_power'], lsps['all']['frequency'], rv_jd, fap, fap_method)
+            ax.axhline(thresh, ls='--', lw=1, c='firebrick', label=f'FAP = {fap}')
+            ax.axhspan(-1, thresh, alpha=0.1)
+            ax.legend(loc=2)
+            
+            # all S-index values
+            ax = axes[1]
+            ax.plot(periods['all'], lsps['all']['sval_power'], c='navy', lw=1, label='All S-index')
+            thresh = self._fap_power_thresh(lsps['all']['sval_power'], lsps['all']['frequency'], sval_jd, fap, fap_method)
+            ax.axhline(thresh, ls='--', lw=1, c='firebrick')
+            ax.axhspan(-1, thresh, alpha=0.1)
+            ax.legend(loc=2)
         
         for i, tel in enumerate(self.tels):
             # RV power
-            ax = axes[int(2*i + 2)]
-            ax.plot(1/lsps[tel]['frequency'], lsps[tel]['rv_power'], c='navy', lw=1, label=f'{tel} RVs')
-            ax.axhline(self.compute_fap_thresh(lsps[tel]['rv_power'], fap=fap)[0], ls='--', lw=1, c='firebrick')
-            ax.axhspan(-1, self.compute_fap_thresh(lsps[tel]['rv_power'], fap=fap)[0], alpha=0.1)
+            ax = axes[int(2*(i + n_combined))]
+            ax.plot(periods[tel], lsps[tel]['rv_power'], c='navy', lw=1, label=f'{tel} RVs')
+            thresh = self._fap_power_thresh(lsps[tel]['rv_power'], lsps[tel]['frequency'], tel_jd[tel], fap, fap_method)
+            label = f'FAP = {fap}' if (i == 0 and not include_combined) else None
+            ax.axhline(thresh, ls='--', lw=1, c='firebrick', label=label)
+            ax.axhspan(-1, thresh, alpha=0.1)
             ax.legend(loc=2)
             
-            # window function power
-            ax = axes[int(2*i + 3)]
-            ax.plot(1/lsps[tel]['frequency'], lsps[tel]['windowfn_power'], c='navy', lw=1, label=f'{tel} Window')
-            ax.axhline(self.compute_fap_thresh(lsps[tel]['windowfn_power'], fap=fap)[0], ls='--', lw=1, c='firebrick')
-            ax.axhspan(-1, self.compute_fap_thresh(lsps[tel]['windowfn_power'], fap=fap)[0], alpha=0.1)
+            # window function power; the analytic (noise) FAP does not apply to it
+            ax = axes[int(2*(i + n_combined) + 1)]
+            ax.plot(periods[tel], lsps[tel]['windowfn_power'], c='navy', lw=1, label=f'{tel} Window')
+            if fap_method != 'analytic':
+                thresh = self._fap_power_thresh(lsps[tel]['windowfn_power'], lsps[tel]['frequency'], tel_jd[tel], fap, fap_method)
+                ax.axhline(thresh, ls='--', lw=1, c='firebrick')
+                ax.axhspan(-1, thresh, alpha=0.1)
             ax.legend(loc=2)
         
         # add detected periods
@@ -224,7 +763,10 @@ class LSPeriodogram():
         axes[-1].set_xscale('log')
         axes[-1].set_xticks([10, 100, 1000, 10000])
         axes[-1].set_xticklabels([10, 100, 1000, 10000])
-        axes[-1].set_xlim(1/lsps['all']['frequency'].max(), 1/lsps['all']['frequency'].min())
+        axes[-1].set_xlim(
+            min(per[-1] for per in periods.values()),
+            max(per[0] for per in periods.values())
+        )
         axes[-1].set_xlabel('Period (days)', size=14)
         
         fig.savefig(self.output_dir + f'/{self.data.hd_name}_LSperiodograms.pdf', dpi=200)
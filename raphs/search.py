@@ -9,19 +9,51 @@ from radvel.utils import bintels
 from .stardata import StarData
 
 
+def build_search_context(data : StarData) -> dict:
+    """Build the per-star setup shared by the RV and S-index searches
+
+    Args:
+        data (StarData): StarData object
+
+    Returns:
+        dict: search context with the star name and stellar mass (value, uncert)
+    """
+    # get stellar mass and uncert
+    # NOTE: here using ARIADNE-derived masses
+    mstar = (
+        data.catalog_entry['sed_grav_mass'],
+        np.mean([data.catalog_entry['sed_grav_masserr1'], data.catalog_entry['sed_grav_masserr2']])
+        )
+    
+    ctx = dict(
+        starname=data.hd_name,
+        mstar=mstar,
+    )
+    
+    return ctx
+
+
 def search_rvs(
     data : StarData,
     output_dir : str,
     bin_size : float = 0.5,
+    ctx : dict = None,
     **search_kwargs
     ) -> str:
     """Search RVs in a given data set
 
+    NOTE: with mcmc=True, rvsearch polishes the final model with a
+          max-likelihood (Powell) fit and then samples it with radvel.mcmc,
+          which is already an emcee affine-invariant ensemble sampler
+          (50 walkers per ensemble, Gelman-Rubin and T_z convergence checks).
+          The number of parallel ensembles is capped by `workers`.
+
     Args:
         data (StarData): StarData object
         output_dir (str): output directory
         bin_size (float, optional): Bin size in days. Defaults to 0.5.
-    
+        ctx (dict, optional): context from build_search_context. Defaults to None (built here).
+
     Returns:
         search.Search: searcher
     """
@@ -32,39 +64,34 @@ def search_rvs(
     # bin RVs
     else:
         jd_bin, mnvel_bin, errvel_bin, tel_bin = bintels(
-            data.rv_data['jd'].values,
-            data.rv_data['mnvel'].values,
-            data.rv_data['errvel'].values,
-            data.rv_data['tel'].values,
+            data.rv_data['jd'].to_numpy(dtype=np.float64),
+            data.rv_data['mnvel'].to_numpy(dtype=np.float64),
+            data.rv_data['errvel'].to_numpy(dtype=np.float64),
+            data.rv_data['tel'].to_numpy(),
             binsize=bin_size
         )
-        # update values in new df
-        rv_timeseries = pd.DataFrame()
-        rv_timeseries['jd'] = jd_bin
-        rv_timeseries['mnvel'] = mnvel_bin
-        rv_timeseries['errvel'] = errvel_bin
-        rv_timeseries['tel'] = tel_bin
+        # build the binned df in one go
+        rv_timeseries = pd.DataFrame(
+            {'jd' : jd_bin, 'mnvel' : mnvel_bin, 'errvel' : errvel_bin, 'tel' : tel_bin},
+            copy=False
+        )
                 
     
-    # get stellar mass and uncert
-    # NOTE: here using ARIADNE-derived masses
-    mstar = (
-        data.catalog_entry['sed_grav_mass'],
-        np.mean([data.catalog_entry['sed_grav_masserr1'], data.catalog_entry['sed_grav_masserr2']])
-        )
+    # shared per-star setup
+    if ctx is None:
+        ctx = build_search_context(data)
     
     # initiate search
     searcher = Search(
         rv_timeseries,
-        starname=data.hd_name,
-        mstar=mstar,
+        starname=ctx['starname'],
+        mstar=ctx['mstar'],
         **search_kwargs
     )
     
     # set up output dir
     out_subdir = f'{output_dir}/RV_search'
-    if not os.path.exists(out_subdir):
-        os.makedirs(out_subdir)
+    os.makedirs(out_subdir, exist_ok=True)
     
     # run search
     searcher.run_search(outdir=out_subdir)
@@ -80,6 +107,7 @@ def search_sinds(
     data : StarData,
     output_dir : str,
     bin_size : float = 0.5,
+    ctx : dict = None,
     **search_kwargs
     ) -> str:
     """Search S index values in a given data set
@@ -88,58 +116,55 @@ def search_sinds(
         data (StarData): StarData object
         output_dir (str): output directory
         bin_size (float, optional): Bin size in days. Defaults to 0.5.
+        ctx (dict, optional): context from build_search_context. Defaults to None (built here).
     
     Returns:
         search.Search: searcher
     """
     # must change column names to match rvsearch syntax
-    sinds = data.S_index_data.copy()
-    sinds.rename(
-        columns={
-            'sind' : 'mnvel',
-            'errs' : 'errvel',
-            }, 
-        inplace=True
+    sinds = pd.DataFrame(
+        {
+            'jd' : data.S_index_data['jd'].to_numpy(),
+            'mnvel' : data.S_index_data['sind'].to_numpy(),
+            'errvel' : data.S_index_data['errs'].to_numpy(),
+            'tel' : data.S_index_data['tel'].to_numpy(),
+        },
+        copy=False
     )
     
     # bin time series
     if bin_size is not None:
         jd_bin, mnvel_bin, errvel_bin, tel_bin = bintels(
-            sinds['jd'].values,
-            sinds['mnvel'].values,
-            sinds['errvel'].values,
-            sinds['tel'].values,
+            sinds['jd'].to_numpy(dtype=np.float64),
+            sinds['mnvel'].to_numpy(dtype=np.float64),
+            sinds['errvel'].to_numpy(dtype=np.float64),
+            sinds['tel'].to_numpy(),
             binsize=bin_size
         )
-        # update values in new df
-        sind_timeseries = pd.DataFrame()
-        sind_timeseries['jd'] = jd_bin
-        sind_timeseries['mnvel'] = mnvel_bin
-        sind_timeseries['errvel'] = errvel_bin
-        sind_timeseries['tel'] = tel_bin
+        # build the binned df in one go
+        sind_timeseries = pd.DataFrame(
+            {'jd' : jd_bin, 'mnvel' : mnvel_bin, 'errvel' : errvel_bin, 'tel' : tel_bin},
+            copy=False
+        )
     else:
         sind_timeseries = sinds
                 
     
-    # get stellar mass and uncert
-    # NOTE: here using ARIADNE-derived masses
-    mstar = (
-        data.catalog_entry['sed_grav_mass'],
-        np.mean([data.catalog_entry['sed_grav_masserr1'], data.catalog_entry['sed_grav_masserr2']])
-        )
+    # shared per-star setup
+    if ctx is None:
+        ctx = build_search_context(data)
     
     # initiate search
     searcher = Search(
         sind_timeseries,
-        starname=data.hd_name,
-        mstar=mstar,
+        starname=ctx['starname'],
+        mstar=ctx['mstar'],
         **search_kwargs
     )
     
     # set up output dir
     out_subdir = f'{output_dir}/Sind_search'
-    if not os.path.exists(out_subdir):
-        os.makedirs(out_subdir)
+    os.makedirs(out_subdir, exist_ok=True)
     
     # run search
     searcher.run_search(outdir=out_subdir)
@@ -1,24 +1,141 @@
 import os
+from functools import lru_cache, cached_property
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 import pandas as pd
 
 from .utilities import *
 
 
+CATALOG_FN = 'spores_catalog_v1.0.0.csv'
+
+# instrument labels (pre/post-upgrade epochs), stored as a categorical column
+TELS = ['harps_pre', 'harps_post', 'hires_pre', 'hires_post']
+
+# empirically determined S-index uncertainty of each instrument in TELS
+S_INDEX_ERRS = np.array([0.007, 0.006, 0.01, 0.009])
+
+# HARPS RVBank columns used (time, RV, RV error, R'HK)
+HARPS_COLS = ['BJD', 'RV_mlc_nzp', 'e_RV_mlc_nzp', 'RHKp']
+
+# Keck/HIRES EBPS .vels columns, and those used (time, RV, RV error, S-index)
+HIRES_COL_NAMES = ['JD', 'RVel', 'e_RVel', 'S_value', 'Halpha', 'phot_per_pix', 't_exp']
+HIRES_COLS = ['JD', 'RVel', 'e_RVel', 'S_value']
+
+
+@lru_cache(maxsize=None)
+def load_catalog(data_dir : str = 'data/') -> pd.DataFrame:
+    """Load the EMSL/SPORES catalog
+
+    The catalog is read through a memory map, once per process and data_dir,
+    and indexed by HD name. The returned frame is shared between
+    callers and should not be modified.
+
+    Args:
+        data_dir (str, optional): Directory where all data is stored. Defaults to 'data/'.
+
+    Returns:
+        pd.DataFrame: catalog
+    """
+    catalog_df = pd.read_csv(data_dir + CATALOG_FN, memory_map=True)
+    
+    return catalog_df.set_index('hd_name', drop=False)
+
+
+def _harps_tel_codes(bjd : np.ndarray) -> np.ndarray:
+    """Instrument codes (into TELS) of HARPS observations
+
+    Pre-upgrade up to BJD 2457163, post-upgrade from BJD 2457173 (Trifonov et al. 2020).
+    Observations in between get -1.
+
+    Args:
+        bjd (np.ndarray): observation times
+
+    Returns:
+        np.ndarray: int8 codes
+    """
+    return np.where(bjd <= 2_457_163, 0, np.where(bjd >= 2_457_173, 1, -1)).astype(np.int8)
+
+
+def _hires_tel_codes(jd : np.ndarray) -> np.ndarray:
+    """Instrument codes (into TELS) of Keck/HIRES observations
+
+    Pre-upgrade up to August 18, 2004 (JD 2453236), post-upgrade after.
+
+    Args:
+        jd (np.ndarray): observation times
+
+    Returns:
+        np.ndarray: int8 codes
+    """
+    return np.where(jd <= 2_453_236, 2, 3).astype(np.int8)
+
+
+def _clip_and_sort(
+    jd : np.ndarray,
+    values : np.ndarray,
+    keep : np.ndarray,
+    outlier_threshold : float,
+    ) -> np.ndarray:
+    """Indices of the observations to keep, sorted by time
+
+    Rejects values more than outlier_threshold sample standard deviations from
+    the mean, with both statistics taken over the observations in keep and
+    skipping NaNs (as in pandas).
+
+    Args:
+        jd (np.ndarray): observation times
+        values (np.ndarray): observed values
+        keep (np.ndarray): boolean mask of valid observations
+        outlier_threshold (float): outlier rejection threshold in sigma
+
+    Returns:
+        np.ndarray: row indices
+    """
+    mean = np.nanmean(values[keep])
+    std = np.nanstd(values[keep], ddof=1)
+    keep = np.flatnonzero(keep & ~(np.abs(values - mean) > outlier_threshold * std))
+    
+    return keep[np.argsort(jd[keep], kind='stable')]
+
+
+@lru_cache(maxsize=None)
+def _dir_index(path : str) -> frozenset:
+    """List the files in a data directory, once per process
+
+    Args:
+        path (str): directory
+
+    Returns:
+        frozenset: file names (empty if the directory does not exist)
+    """
+    try:
+        return frozenset(entry.name for entry in os.scandir(path))
+    except FileNotFoundError:
+        return frozenset()
+
+
 class StarData():
     """StarData
 
     Class that defines data for a given star.
+    
+    Data files are read, and the data sets combined, on first access of
+    harps_df, hires_df, rv_data, or S_index_data.
 
     Args:
         hd_name (int): HD identifier number for a star.
         data_dir (str, optional): Directory where all data is stored. Defaults to 'data/'.
         outlier_threshold (float, optional): Outlier rejection threshold in sigma. Defaults to 5.
+        catalog_entry (dict, optional): Pre-loaded catalog entry for this star (dict or
+            pd.Series). If given, the catalog is not read. Defaults to None.
     """
     def __init__(self, 
         hd_name : str, 
         data_dir : str = 'data/',
         outlier_threshold : float = 5,
+        catalog_entry : dict = None,
         ) -> None:
         """__init__
         
@@ -26,46 +143,58 @@ class StarData():
         self.hd_name = hd_name
         self.data_dir = data_dir
         self.outlier_threshold = outlier_threshold
+        self.catalog_df = None
         
-        # load the EMSL/SPORES catalog
-        self.catalog_df = pd.read_csv(self.data_dir + 'spores_catalog_v1.0.0.csv')
-        
-        # Find catalog entry for given HD target
-        try:
-            self.catalog_entry = self._load_catalog_entry()
-        except ValueError:
-            raise
+        if catalog_entry is not None:
+            self.catalog_entry = catalog_entry
+        else:
+            # load the EMSL/SPORES catalog
+            self.catalog_df = load_catalog(self.data_dir)
+            
+            # Find catalog entry for given HD target
+            try:
+                self.catalog_entry = self._load_catalog_entry()
+            except ValueError:
+                raise
         
-        # Load HARPS data
-        self.harps_df = None
-        try:
-            self.harps_df = self._load_harps_rvbank_data()
-        except FileNotFoundError as err:
-            print(err)
-            pass
+        # File names to look for, from the HD/GJ/HIP/TYC identifiers
+        self._names = self._normalized_names()
         
-        # Load HIRES data
-        self.hires_df = None
-        try:
-            self.hires_df = self._load_hires_ebps_data()
-        except FileNotFoundError as err:
-            print(err)
-            pass
+        return
+    
+    
+    @classmethod
+    def load_many(cls,
+        hd_names : list,
+        data_dir : str = 'data/',
+        max_workers : int = 8,
+        **kwargs
+        ) -> list:
+        """Load several stars concurrently
+
+        File reads and parsing of different stars overlap in a thread pool.
+
+        Args:
+            hd_names (list): HD names as they appear in the SPORES catalog
+            data_dir (str, optional): Directory where all data is stored. Defaults to 'data/'.
+            max_workers (int, optional): number of threads. Defaults to 8.
+            **kwargs: keyword args to pass to StarData
+
+        Returns:
+            list: StarData objects, in the order of hd_names
+        """
+        def load(hd_name):
+            star = cls(hd_name, data_dir=data_dir, **kwargs)
+            star.S_index_data  # read and combine all data now
+            return star
         
-        # Combine data sets
-        self.rv_data = None
-        self.S_index_data = None
-        try:
-            self.rv_data = self._combine_rvs()
-            self.S_index_data = self._combine_S_indexes()
-        except ValueError as err:
-            print(err)
-            pass
+        with ThreadPoolExecutor(max_workers=max_workers) as ex:
+            stars = list(ex.map(load, hd_names))
         
-        return
+        return stars
     
     
-    def _load_catalog_entry(self) -> dict:
+    def _load_catalog_entry(self) -> pd.Series:
         """load catalog entry
 
         Attempt to load row from SPORES catalog
@@ -74,17 +203,101 @@ class StarData():
             ValueError: no catalog entry found for given HD number
 
         Returns:
-            dict: catalog entry for given HD name
+            pd.Series: catalog entry for given HD name
         """
-        catalog_entry = self.catalog_df[self.catalog_df['hd_name'] == self.hd_name]
-        
         # Check if entry exists
-        if len(catalog_entry) == 0:
+        try:
+            catalog_entry = self.catalog_df.loc[[self.hd_name]]
+        except KeyError:
             raise ValueError(f'No catalog entry for {self.hd_name}.')
         
-        catalog_entry_dict = catalog_entry.iloc[0].to_dict()
+        return catalog_entry.iloc[0]
+    
+    
+    @cached_property
+    def harps_df(self) -> pd.DataFrame:
+        """HARPS RVBank data, read on first access (None if not found)
+        """
+        try:
+            return self._load_harps_rvbank_data()
+        except FileNotFoundError as err:
+            print(err)
+            return None
+    
+    
+    @cached_property
+    def hires_df(self) -> pd.DataFrame:
+        """Keck/HIRES EBPS data, read on first access (None if not found)
+        """
+        try:
+            return self._load_hires_ebps_data()
+        except FileNotFoundError as err:
+            print(err)
+            return None
+    
+    
+    @cached_property
+    def rv_data(self) -> pd.DataFrame:
+        """Combined RV data, built on first access (None if there is none)
+        """
+        self._load_sources()
+        try:
+            return self._combine_rvs()
+        except ValueError as err:
+            print(err)
+            return None
+    
+    
+    @cached_property
+    def S_index_data(self) -> pd.DataFrame:
+        """Combined S-index data, built on first access (None if there is none, or no RVs)
+        """
+        if self.rv_data is None:
+            return None
+        try:
+            return self._combine_S_indexes()
+        except ValueError as err:
+            print(err)
+            return None
+    
+    
+    def _load_sources(self) -> None:
+        """Read the HARPS and HIRES files not loaded yet, concurrently
+
+        The CSV parser releases the GIL, so the two reads overlap. Results are
+        stored as harps_df and hires_df, as if those had been accessed.
+        """
+        loaders = dict(harps_df=self._load_harps_rvbank_data, hires_df=self._load_hires_ebps_data)
+        with ThreadPoolExecutor(max_workers=2) as ex:
+            futures = {attr : ex.submit(loader) for attr, loader in loaders.items() if attr not in vars(self)}
+        
+        for attr, future in futures.items():
+            try:
+                vars(self)[attr] = future.result()
+            except FileNotFoundError as err:
+                print(err)
+                vars(self)[attr] = None
         
-        return catalog_entry_dict
+        return
+    
+    
+    def _normalized_names(self) -> dict:
+        """Star identifiers as they appear in data file names
+
+        Returns:
+            dict: whitespace-free HD name, HD name without the component letter
+                (if 'A' in name), GJ, HIP, and TYC names; None where not available
+        """
+        names = dict(
+            hd=''.join(self.hd_name.split()),
+            hd_trimmed=''.join(self.hd_name.split()[:-1]) if 'A' in self.hd_name else None,
+            tyc='TYC' + str(self.catalog_entry['tycho2_id']),
+        )
+        for key in ['gj', 'hip']:
+            name = self.catalog_entry[f'{key}_name']
+            names[key] = ''.join(name.split()) if isinstance(name, str) else None
+        
+        return names
     
     
     def _load_harps_rvbank_data(self) -> pd.DataFrame:
@@ -99,47 +312,18 @@ class StarData():
             pd.DataFrame: table of values
         """
         harps_rvbank_dir = self.data_dir + 'harps_rv_bank'
-        
-        # Attempt on HD name
-        try:
-            hd_name = ''.join(self.hd_name.split())
-            harps_rvbank_data = pd.read_csv(f'{harps_rvbank_dir}/{hd_name}.csv', index_col=0)
-            return harps_rvbank_data
-        except FileNotFoundError:
-            pass
-        
-        # Attempt again if letter in name
-        if 'A' in self.hd_name:
-            try:
-                hd_name = ''.join(self.hd_name.split()[:-1])
-                harps_rvbank_data = pd.read_csv(f'{harps_rvbank_dir}/{hd_name}.csv', index_col=0)
+        file_names = _dir_index(harps_rvbank_dir)
+        
+        # Attempt on HD name, again without letter if in name, then GJ, HIP, and TYC names
+        for key in ['hd', 'hd_trimmed', 'gj', 'hip', 'tyc']:
+            name = self._names[key]
+            if name is not None and f'{name}.csv' in file_names:
+                harps_rvbank_data = pd.read_csv(
+                    f'{harps_rvbank_dir}/{name}.csv',
+                    usecols=HARPS_COLS,
+                    dtype=np.float64
+                )
                 return harps_rvbank_data
-            except FileNotFoundError:
-                pass
-        
-        # Attempt on GJ name
-        try:
-            gj_name = ''.join(self.catalog_entry['gj_name'].split())
-            harps_rvbank_data = pd.read_csv(f'{harps_rvbank_dir}/{gj_name}.csv', index_col=0)
-            return harps_rvbank_data
-        except FileNotFoundError:
-            pass
-        
-        # Attempt on HIP name
-        try:
-            hip_name = ''.join(self.catalog_entry['hip_name'].split())
-            harps_rvbank_data = pd.read_csv(f'{harps_rvbank_dir}/{hip_name}.csv', index_col=0)
-            return harps_rvbank_data
-        except FileNotFoundError:
-            pass
-        
-        # Attempt on TYC name
-        try:
-            tyc_name = 'TYC' + str(self.catalog_entry['tycho2_id'])
-            harps_rvbank_data = pd.read_csv(f'{harps_rvbank_dir}/{tyc_name}.csv', index_col=0)
-            return harps_rvbank_data
-        except FileNotFoundError:
-            pass
         
         # No HARPS data found
         raise FileNotFoundError(f'No HARPS data found')
@@ -157,40 +341,46 @@ class StarData():
             pd.DataFrame: table of values
         """
         hires_ebps_dir = self.data_dir + 'ebps_keck_hires'
-        col_names = ['JD', 'RVel', 'e_RVel', 'S_value', 'Halpha', 'phot_per_pix', 't_exp']
+        file_names = _dir_index(hires_ebps_dir)
 
-        # Attempt on HD name
-        try:
-            hd_name = ''.join(self.hd_name.split())
-            file_name = f'{hd_name}_KECK.vels'
-            keck_hires_data = pd.read_csv(f'{hires_ebps_dir}/{file_name}', sep='\s+', header=None, names=col_names)
-            return keck_hires_data
-        except FileNotFoundError:
-            pass
-        
-        # Attempt again if letter in name
-        if 'A' in self.hd_name:
-            try:
-                hd_name = ''.join(self.hd_name.split()[:-1])
-                file_name = f'{hd_name}_KECK.vels'
-                keck_hires_data = pd.read_csv(f'{hires_ebps_dir}/{file_name}', sep='\s+', header=None, names=col_names)
+        # Attempt on HD name, again without letter if in name, then HIP name
+        for key in ['hd', 'hd_trimmed', 'hip']:
+            name = self._names[key]
+            file_name = f'{name}_KECK.vels'
+            if name is not None and file_name in file_names:
+                keck_hires_data = pd.read_csv(
+                    f'{hires_ebps_dir}/{file_name}',
+                    sep=r'\s+',
+                    engine='c',
+                    header=None,
+                    names=HIRES_COL_NAMES,
+                    usecols=HIRES_COLS,
+                    dtype=np.float64
+                )
                 return keck_hires_data
-            except FileNotFoundError:
-                pass
-        
-        # Attempt on HIP name
-        try:
-            hip_name = ''.join(self.catalog_entry['hip_name'].split())
-            file_name = f'{hip_name}_KECK.vels'
-            keck_hires_data = pd.read_csv(f'{hires_ebps_dir}/{file_name}', sep='\s+', header=None, names=col_names)
-            return keck_hires_data
-        except FileNotFoundError:
-            pass
 
         # No HIRES data found
         raise FileNotFoundError(f'No HIRES data found')
     
     
+    @cached_property
+    def _tel_codes(self) -> dict:
+        """Instrument codes of the HARPS and HIRES observations
+
+        Computed once and shared by _combine_rvs and _combine_S_indexes.
+
+        Returns:
+            dict: int8 codes into TELS for 'harps' and 'hires' (if loaded)
+        """
+        tel_codes = dict()
+        if self.harps_df is not None:
+            tel_codes['harps'] = _harps_tel_codes(self.harps_df['BJD'].to_numpy())
+        if self.hires_df is not None:
+            tel_codes['hires'] = _hires_tel_codes(self.hires_df['JD'].to_numpy())
+        
+        return tel_codes
+    
+    
     def _combine_rvs(self) -> pd.DataFrame:
         """combine rvs data sets
 
@@ -199,54 +389,41 @@ class StarData():
         Returns:
             pd.DataFrame: rv_data
         """
-        rv_data = pd.DataFrame()
+        jds, mnvels, errvels, tels = [], [], [], []
         
         # add HARPS data
         if self.harps_df is not None:
-            # pre-upgrade
-            harps_pre_msk = self.harps_df['BJD'] <= 2_457_163  # pre-upgrade (Trifonov et al. 2020)
-            harps_pre_data = self.harps_df.loc[harps_pre_msk, ['BJD', 'RV_mlc_nzp', 'e_RV_mlc_nzp']]
-            harps_pre_data['tel'] = 'harps_pre'
-            harps_pre_data = harps_pre_data.rename(columns={'BJD':'jd', 'RV_mlc_nzp':'mnvel', 'e_RV_mlc_nzp':'errvel'})
-            rv_data = pd.concat([rv_data, harps_pre_data])
-
-            # post-upgrade
-            harps_post_msk = self.harps_df['BJD'] >= 2_457_173  # post-upgrade (Trifonov et al. 2020)
-            harps_post_data = self.harps_df.loc[harps_post_msk, ['BJD', 'RV_mlc_nzp', 'e_RV_mlc_nzp']]
-            harps_post_data['tel'] = 'harps_post'
-            harps_post_data = harps_post_data.rename(columns={'BJD':'jd', 'RV_mlc_nzp':'mnvel', 'e_RV_mlc_nzp':'errvel'})
-            rv_data = pd.concat([rv_data, harps_post_data])
+            # pre-upgrade and post-upgrade
+            bjd = self.harps_df['BJD'].to_numpy()
+            codes = self._tel_codes['harps']
+            use = codes >= 0
+            jds.append(bjd[use])
+            mnvels.append(self.harps_df['RV_mlc_nzp'].to_numpy()[use])
+            errvels.append(self.harps_df['e_RV_mlc_nzp'].to_numpy()[use])
+            tels.append(codes[use])
             
         # add HIRES data
         if self.hires_df is not None:
-            # pre-upgrade
-            hires_pre_msk = self.hires_df['JD'] <= 2_453_236  # pre-upgrade (August 18, 2004 = JD 2453236)
-            hires_pre_data = self.hires_df.loc[hires_pre_msk, ['JD', 'RVel', 'e_RVel']]
-            hires_pre_data['tel'] = 'hires_pre'
-            hires_pre_data = hires_pre_data.rename(columns={'JD':'jd', 'RVel':'mnvel', 'e_RVel':'errvel'})
-            rv_data = pd.concat([rv_data, hires_pre_data])
-            
-            # post-upgrade
-            hires_post_msk = self.hires_df['JD'] >= 2_453_236  # post-upgrade (August 18, 2004 = JD 2453236)
-            hires_post_data = self.hires_df.loc[hires_post_msk, ['JD', 'RVel', 'e_RVel']]
-            hires_post_data['tel'] = 'hires_post'
-            hires_post_data = hires_post_data.rename(columns={'JD':'jd', 'RVel':'mnvel', 'e_RVel':'errvel'})
-            rv_data = pd.concat([rv_data, hires_post_data])
+            # pre-upgrade and post-upgrade
+            jd = self.hires_df['JD'].to_numpy()
+            jds.append(jd)
+            mnvels.append(self.hires_df['RVel'].to_numpy())
+            errvels.append(self.hires_df['e_RVel'].to_numpy())
+            tels.append(self._tel_codes['hires'])
         
         # clean, sort, and re-index data
-        if len(rv_data) > 0:
+        if sum(map(len, jds)) > 0:
+            jd, mnvel = np.concatenate(jds), np.concatenate(mnvels)
             
-            # reject outliers
-            mean = rv_data['mnvel'].mean()
-            std = rv_data['mnvel'].std()
-            threshold = std * self.outlier_threshold
-            rv_data = rv_data.drop(rv_data[abs(rv_data['mnvel'] - mean) > threshold].index)
+            # reject outliers and sort by JD
+            order = _clip_and_sort(jd, mnvel, np.ones(len(jd), dtype=bool), self.outlier_threshold)
             
-            # sort by JD
-            rv_data = rv_data.sort_values('jd')
-            
-            # reset index
-            rv_data = rv_data.reset_index(drop=True)
+            rv_data = pd.DataFrame({
+                'jd' : jd[order],
+                'mnvel' : mnvel[order],
+                'errvel' : np.concatenate(errvels)[order],
+                'tel' : pd.Categorical.from_codes(np.concatenate(tels)[order], categories=TELS),
+            })
             
             return rv_data
         
@@ -263,7 +440,7 @@ class StarData():
         Returns:
             pd.DataFrame: S_index_data
         """
-        st_activity_data = pd.DataFrame()
+        jds, sinds, errs, tels = [], [], [], []
         
         # grab B-V mag
         bv_mag = self.catalog_entry['sy_bvmag']
@@ -273,61 +450,38 @@ class StarData():
         
         # add HARPS data
         if self.harps_df is not None:
-            # pre-upgrade
-            harps_pre_msk = self.harps_df['BJD'] <= 2_457_163  # pre-upgrade (Trifonov et al. 2020)
-            harps_pre_data = self.harps_df.loc[harps_pre_msk, ['BJD', 'RHKp']]
-            harps_pre_data['sind'] = convert_rhkp_to_sindex(harps_pre_data['RHKp'].values, bv_mag=bv_mag, subgiant=subgiant)
-            harps_pre_data['errs'] = 0.007  # Empirically determined S-index uncertainty
-            harps_pre_data['tel'] = 'harps_pre'
-            harps_pre_data.drop(columns=['RHKp'], inplace=True)
-            harps_pre_data = harps_pre_data.rename(columns={'BJD':'jd'})
-            st_activity_data = pd.concat([st_activity_data, harps_pre_data])
-
-            # post-upgrade
-            harps_post_msk = self.harps_df['BJD'] >= 2_457_173  # post-upgrade (Trifonov et al. 2020)
-            harps_post_data = self.harps_df.loc[harps_post_msk, ['BJD', 'RHKp']]
-            harps_post_data['sind'] = convert_rhkp_to_sindex(harps_post_data['RHKp'].values, bv_mag=bv_mag, subgiant=subgiant)
-            harps_post_data['errs'] = 0.006  # Empirically determined S-index uncertainty
-            harps_post_data['tel'] = 'harps_post'
-            harps_post_data.drop(columns=['RHKp'], inplace=True)
-            harps_post_data = harps_post_data.rename(columns={'BJD':'jd'})
-            st_activity_data = pd.concat([st_activity_data, harps_post_data])
+            # pre-upgrade and post-upgrade
+            bjd = self.harps_df['BJD'].to_numpy()
+            codes = self._tel_codes['harps']
+            use = codes >= 0
+            jds.append(bjd[use])
+            sinds.append(convert_rhkp_to_sindex(self.harps_df['RHKp'].to_numpy()[use], bv_mag=bv_mag, subgiant=subgiant))
+            errs.append(S_INDEX_ERRS[codes[use]])
+            tels.append(codes[use])
             
         # add HIRES data
         if self.hires_df is not None:
-            # pre-upgrade
-            hires_pre_msk = self.hires_df['JD'] <= 2_453_236  # pre-upgrade (August 18, 2004 = JD 2453236)
-            hires_pre_data = self.hires_df.loc[hires_pre_msk, ['JD', 'S_value']]
-            hires_pre_data['errs'] = 0.01  # Empirically determined S-index uncertainty
-            hires_pre_data['tel'] = 'hires_pre'
-            hires_pre_data = hires_pre_data.rename(columns={'JD':'jd', 'S_value':'sind'})
-            st_activity_data = pd.concat([st_activity_data, hires_pre_data])
-            
-            # post-upgrade
-            hires_post_msk = self.hires_df['JD'] >= 2_453_236  # post-upgrade (August 18, 2004 = JD 2453236)
-            hires_post_data = self.hires_df.loc[hires_post_msk, ['JD', 'S_value']]
-            hires_post_data['errs'] = 0.009  # Empirically determined S-index uncertainty
-            hires_post_data['tel'] = 'hires_post'
-            hires_post_data = hires_post_data.rename(columns={'JD':'jd', 'S_value':'sind'})
-            st_activity_data = pd.concat([st_activity_data, hires_post_data])
+            # pre-upgrade and post-upgrade
+            jd = self.hires_df['JD'].to_numpy()
+            codes = self._tel_codes['hires']
+            jds.append(jd)
+            sinds.append(self.hires_df['S_value'].to_numpy())
+            errs.append(S_INDEX_ERRS[codes])
+            tels.append(codes)
         
         # clean, sort, and re-index data
-        if len(st_activity_data) > 0:
-            
-            # remove negative (bad) values
-            st_activity_data = st_activity_data.drop(st_activity_data[st_activity_data['sind'] < 0].index)
-            
-            # reject outliers
-            mean = st_activity_data['sind'].mean()
-            std = st_activity_data['sind'].std()
-            threshold = std * self.outlier_threshold
-            st_activity_data = st_activity_data.drop(st_activity_data[abs(st_activity_data['sind'] - mean) > threshold].index)
+        if sum(map(len, jds)) > 0:
+            jd, sind = np.concatenate(jds), np.concatenate(sinds)
             
-            # sort
-            st_activity_data = st_activity_data.sort_values('jd')
+            # remove negative (bad) values, reject outliers, and sort by JD
+            order = _clip_and_sort(jd, sind, ~(sind < 0), self.outlier_threshold)
             
-            # reset index
-            st_activity_data = st_activity_data.reset_index(drop=True)
+            st_activity_data = pd.DataFrame({
+                'jd' : jd[order],
+                'sind' : sind[order],
+                'errs' : np.concatenate(errs)[order],
+                'tel' : pd.Categorical.from_codes(np.concatenate(tels)[order], categories=TELS),
+            })
             
             return st_activity_data
         
@@ -2,22 +2,21 @@ import numpy as np
 
 
 
-def convert_rhkp_to_sindex(
-    rhkp : float,
+def _sindex_coeffs(
     bv_mag : float,
     subgiant : bool = False
-    ) -> float:
-    """Convert R_HKp to Mt Wilson S-index
+    ) -> tuple:
+    """Coefficients of the R_HKp to Mt Wilson S-index conversion
 
-    Conversion procedure from Gomes da Silva et al. (2021)
+    S = (R_HKp + R_phot) * scale, with R_phot and scale depending only on B-V
+    color and luminosity class (Gomes da Silva et al. 2021).
 
     Args:
-        rhkp (float): R_HK_prime
         bv_mag (float): B-V color (mag)
         subgiant (bool, optional): Main sequence or subgiant star. Defaults to False (main sequence).
 
     Returns:
-        float: S-index
+        tuple: photospheric contribution R_phot, and scale 1 / (alpha * C_cf)
     """
     # constants
     ALPHA = 1.34E-4
@@ -35,7 +34,29 @@ def convert_rhkp_to_sindex(
     # bolometric correction
     log_Ccf = D * bv_mag**3 + E * bv_mag**2 + F * bv_mag + G
     
+    return 10**log_Rphot, 1 / (ALPHA * 10**log_Ccf)
+
+
+def convert_rhkp_to_sindex(
+    rhkp : float,
+    bv_mag : float,
+    subgiant : bool = False
+    ) -> float:
+    """Convert R_HKp to Mt Wilson S-index
+
+    Conversion procedure from Gomes da Silva et al. (2021)
+
+    Args:
+        rhkp (float): R_HK_prime
+        bv_mag (float): B-V color (mag)
+        subgiant (bool, optional): Main sequence or subgiant star. Defaults to False (main sequence).
+
+    Returns:
+        float: S-index
+    """
+    Rphot, scale = _sindex_coeffs(bv_mag, subgiant=subgiant)
+    
     # calculate Mt Wilson S-index
-    S_mw = (rhkp + 10**log_Rphot) / (ALPHA * 10**log_Ccf)
+    S_mw = (rhkp + Rphot) * scale
     
-    return S_mw
\ No newline at end of file
+    return S_mw
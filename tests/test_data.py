@@ -1,6 +1,9 @@
+import numpy as np
+import pandas as pd
 import matplotlib.pyplot as plt
 
-from raphs.stardata import StarData
+from raphs.stardata import StarData, CATALOG_FN
+from raphs.utilities import convert_rhkp_to_sindex
 
 
 def test_data() -> None:
@@ -17,6 +20,88 @@ def test_data() -> None:
     return None
 
 
+def _write_fixture(data_dir) -> None:
+    """Write a small catalog, HARPS RVBank file, and HIRES .vels file
+
+    RVs are zero except one value of 10 at JD 2455500. With 10 RVs, that value is
+    2.85 sample (ddof=1) or 3.0 population (ddof=0) standard deviations from the mean.
+
+    Args:
+        data_dir (pathlib.Path): data directory
+    """
+    pd.DataFrame(dict(
+        hd_name=['HD 100'], gj_name=[np.nan], hip_name=['HIP 200'], tycho2_id=['1-2-1'],
+        sy_bvmag=[0.65], st_spectype=['G5V'],
+        sed_grav_mass=[1.0], sed_grav_masserr1=[0.1], sed_grav_masserr2=[0.1],
+    )).to_csv(data_dir / CATALOG_FN, index=False)
+
+    # pre-upgrade, upgrade gap (dropped), post-upgrade, pre-upgrade
+    (data_dir / 'harps_rv_bank').mkdir()
+    pd.DataFrame(dict(
+        BJD=[2_457_100., 2_457_168., 2_457_200., 2_457_050.],
+        RV_mlc_nzp=[0., 0., 0., 0.],
+        e_RV_mlc_nzp=[1., 2., 3., 4.],
+        RHKp=[2e-5, 3e-5, 4e-5, 5e-5],
+        other=[9., 9., 9., 9.],
+    )).to_csv(data_dir / 'harps_rv_bank' / 'HD100.csv', index=False)
+
+    # JD, RV, RV error, S-index, H-alpha, photons, exposure time
+    (data_dir / 'ebps_keck_hires').mkdir()
+    rows = [
+        [2_453_000., 0., 5., 0.20],
+        [2_453_300., 0., 6., -1.0],  # bad S-index
+        [2_454_000., 0., 7., 0.21],
+        [2_455_000., 0., 8., 0.19],
+        [2_456_000., 0., 9., 0.20],
+        [2_452_000., 0., 10., 0.22],
+        [2_455_500., 10., 11., 0.18],  # RV outlier
+    ]
+    with open(data_dir / 'ebps_keck_hires' / 'HD100_KECK.vels', 'w') as f:
+        for row in rows:
+            f.write(' '.join(f'{x:.6f}' for x in row) + ' 0.03 1000 300\n')
+
+    return None
+
+
+def test_combined_data(tmp_path) -> None:
+    """Test combined RV and S-index data on fixture files
+
+    """
+    _write_fixture(tmp_path)
+    data_dir = str(tmp_path) + '/'
+
+    # outlier kept: 2.85 sigma with ddof=1 (it would be 3.0 with ddof=0)
+    data = StarData('HD 100', data_dir=data_dir, outlier_threshold=2.9)
+    rv = data.rv_data
+    assert list(rv.columns) == ['jd', 'mnvel', 'errvel', 'tel']
+    assert np.array_equal(rv['jd'], [
+        2_452_000., 2_453_000., 2_453_300., 2_454_000., 2_455_000., 2_455_500., 2_456_000.,
+        2_457_050., 2_457_100., 2_457_200.,
+    ])
+    assert np.array_equal(rv['errvel'], [10., 5., 6., 7., 8., 11., 9., 4., 1., 3.])
+    assert list(rv['tel'].astype(str)) == 2*['hires_pre'] + 5*['hires_post'] + 2*['harps_pre'] + ['harps_post']
+    assert list(rv.index) == list(range(10))
+
+    # outlier rejected
+    data = StarData('HD 100', data_dir=data_dir, outlier_threshold=2.8)
+    assert 2_455_500. not in data.rv_data['jd'].to_numpy()
+    assert len(data.rv_data) == 9
+
+    # S-index: negative value removed, HARPS converted from R'HK
+    sind = data.S_index_data
+    assert list(sind.columns) == ['jd', 'sind', 'errs', 'tel']
+    assert np.array_equal(sind['jd'], [
+        2_452_000., 2_453_000., 2_454_000., 2_455_000., 2_455_500., 2_456_000.,
+        2_457_050., 2_457_100., 2_457_200.,
+    ])
+    harps_sind = convert_rhkp_to_sindex(np.array([5e-5, 2e-5, 4e-5]), bv_mag=0.65)
+    assert np.allclose(sind['sind'], [0.22, 0.20, 0.21, 0.19, 0.18, 0.20, *harps_sind], rtol=1e-12)
+    assert np.array_equal(sind['errs'], [0.01, 0.01, 0.009, 0.009, 0.009, 0.009, 0.007, 0.007, 0.006])
+    assert list(sind['tel'].astype(str)) == 2*['hires_pre'] + 4*['hires_post'] + 2*['harps_pre'] + ['harps_post']
+
+    return None
+
+
 
 if __name__ == '__main__':
     test_data()
\ No newline at end of file
@@ -0,0 +1,184 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from scipy.stats import beta, kstest
+
+import raphs.injrec as injrec
+
+
+INJ_KWARGS = dict(plim=(3.1, 1e4), klim=(0.1, 100.), elim=(0.0, 0.9), num_sim=40, full_grid=False)
+
+
+class _SerialExecutor():
+    """Stand-in for ProcessPoolExecutor running tasks in this process
+    """
+    def __init__(self, *args, **kwargs) -> None:
+        pass
+    
+    
+    def __enter__(self):
+        return self
+    
+    
+    def __exit__(self, *exc) -> None:
+        pass
+    
+    
+    def map(self, fn, iterable):
+        return map(fn, iterable)
+
+
+def _patch_rvsearch(monkeypatch) -> list:
+    """Replace the rvsearch injections and plots with cheap stand-ins
+
+    Args:
+        monkeypatch (pytest.MonkeyPatch): pytest fixture
+
+    Returns:
+        list: number of injections in each chunk run
+    """
+    chunk_sizes = []
+
+    def run_chunk(chunk):
+        injected = pd.DataFrame.from_records(chunk)[injrec.INJ_COLS]
+        chunk_sizes.append(len(injected))
+        recoveries = injected.copy()
+        recoveries[injrec.REC_COLS] = injected.to_numpy()
+        recoveries['recovered'] = True
+        recoveries['bic'] = 0.
+        recoveries['bic_thresh'] = 1.
+        return recoveries
+
+    monkeypatch.setattr(injrec, 'Injections', lambda search_pkl, **kwargs: SimpleNamespace(injected_planets=None))
+    monkeypatch.setattr(injrec, 'Completeness', lambda recoveries, mstar: None)
+    monkeypatch.setattr(injrec, 'CompletenessPlots', lambda comp, searches: SimpleNamespace(
+        completeness_plot=lambda **kwargs: plt.figure()
+    ))
+    monkeypatch.setattr(injrec, 'ProcessPoolExecutor', _SerialExecutor)
+    monkeypatch.setattr(injrec, '_run_chunk', run_chunk)
+
+    return chunk_sizes
+
+
+def test_run_injrec_resume(tmp_path, monkeypatch) -> None:
+    """Test resuming injection/recovery runs from recoveries_partial.csv
+
+    """
+    chunk_sizes = _patch_rvsearch(monkeypatch)
+    search_path = str(tmp_path)
+    search_pkl = f'{search_path}/search.pkl'
+    partial_fn = f'{search_path}/recoveries_partial.csv'
+    fingerprint_fn = f'{search_path}/recoveries_partial.sha1'
+    with open(search_pkl, 'wb') as f:
+        f.write(b'search')
+    searches = SimpleNamespace(starname='HD 0')
+
+    # fresh run
+    full = injrec.run_injrec(search_path, searches, 1.0, 2, seed=1, **INJ_KWARGS)
+    assert len(full) == 40 and sum(chunk_sizes) == 40
+    assert not os.path.exists(partial_fn) and not os.path.exists(fingerprint_fn)
+
+    # interrupted run of the same setup: only the remaining injections are run
+    done = full.iloc[:15].assign(bic=-1.)
+    done.to_csv(partial_fn, index=False)
+    with open(fingerprint_fn, 'w') as f:
+        f.write(injrec._injection_fingerprint(search_pkl, 1, INJ_KWARGS))
+    chunk_sizes.clear()
+    resumed = injrec.run_injrec(search_path, searches, 1.0, 2, seed=1, **INJ_KWARGS)
+    assert sum(chunk_sizes) == 25
+    assert len(resumed) == 40 and (resumed['bic'] == -1.).sum() == 15
+    assert not injrec._injection_keys(resumed).duplicated().any()
+    assert injrec._injection_keys(resumed).sort_values().equals(injrec._injection_keys(full).sort_values())
+    assert not os.path.exists(partial_fn) and not os.path.exists(fingerprint_fn)
+
+    # partial results of a different setup are discarded
+    done.to_csv(partial_fn, index=False)
+    with open(fingerprint_fn, 'w') as f:
+        f.write(injrec._injection_fingerprint(search_pkl, 2, INJ_KWARGS))
+    chunk_sizes.clear()
+    rerun = injrec.run_injrec(search_path, searches, 1.0, 2, seed=1, **INJ_KWARGS)
+    assert sum(chunk_sizes) == 40
+    assert len(rerun) == 40 and not (rerun['bic'] == -1.).any()
+
+    # empty grid
+    empty = injrec.run_injrec(search_path, searches, 1.0, 2, seed=1, **dict(INJ_KWARGS, num_sim=0))
+    assert len(empty) == 0 and list(empty.columns) == injrec.RECOVERIES_COLS
+
+    plt.close('all')
+
+    return None
+
+
+
+def test_draw_beta_eccentricities() -> None:
+    """Test truncated Beta eccentricity draws
+
+    """
+    rng = np.random.default_rng(42)
+    for elim in [(0.0, 0.9), (0.1, 0.5)]:
+        e = injrec.draw_beta_eccentricities(rng, 5000, elim=elim)
+        assert len(e) == 5000
+        assert e.min() >= elim[0] and e.max() <= elim[1]
+
+        # Kipping (2013) Beta distribution, truncated to elim
+        cdf_lo, cdf_hi = beta.cdf(elim, injrec.BETA_E_A, injrec.BETA_E_B)
+        cdf = lambda x: (beta.cdf(x, injrec.BETA_E_A, injrec.BETA_E_B) - cdf_lo) / (cdf_hi - cdf_lo)
+        assert kstest(e, cdf).pvalue > 0.01
+
+    return None
+
+
+def test_draw_injection_grid() -> None:
+    """Test random injection grids
+
+    """
+    plim, klim, elim = (3.1, 1e4), (0.1, 100.), (0.0, 0.9)
+    grid = injrec.draw_injection_grid(np.random.default_rng(7), 5000, plim, klim, elim)
+    assert list(grid.columns) == injrec.INJ_COLS and len(grid) == 5000
+
+    # periods and semi-amplitudes log-uniform within bounds
+    for col, lim in [('inj_period', plim), ('inj_k', klim)]:
+        log_x = np.log10(grid[col])
+        assert log_x.min() >= np.log10(lim[0]) and log_x.max() <= np.log10(lim[1])
+        assert kstest(log_x, 'uniform', args=(np.log10(lim[0]), np.log10(lim[1]/lim[0]))).pvalue > 0.01
+    assert grid['inj_e'].between(*elim).all()
+    assert (grid['inj_tp'] >= 0).all() and (grid['inj_tp'] <= grid['inj_period']).all()
+    assert grid['inj_w'].between(0, 2*np.pi).all()
+
+    # the same seed gives the same grid, and a different seed a different one
+    for beta_e in [False, True]:
+        grid_a = injrec.draw_injection_grid(np.random.default_rng(7), 100, plim, klim, elim, beta_e=beta_e)
+        grid_b = injrec.draw_injection_grid(np.random.default_rng(7), 100, plim, klim, elim, beta_e=beta_e)
+        grid_c = injrec.draw_injection_grid(np.random.default_rng(8), 100, plim, klim, elim, beta_e=beta_e)
+        pd.testing.assert_frame_equal(grid_a, grid_b)
+        assert not grid_a.equals(grid_c)
+
+    return None
+
+
+def test_run_injrec_seed(tmp_path, monkeypatch) -> None:
+    """Test that run_injrec draws the same grid for the same star name
+
+    """
+    _patch_rvsearch(monkeypatch)
+    with open(f'{tmp_path}/search.pkl', 'wb') as f:
+        f.write(b'search')
+
+    grids = [
+        injrec.run_injrec(str(tmp_path), SimpleNamespace(starname=name), 1.0, 1, **INJ_KWARGS)[injrec.INJ_COLS]
+        for name in ['HD 0', 'HD 0', 'HD 1']
+    ]
+    pd.testing.assert_frame_equal(grids[0], grids[1])
+    assert not grids[0].equals(grids[2])
+    plt.close('all')
+
+    return None
+
+
+
+if __name__ == '__main__':
+    test_draw_beta_eccentricities()
+    test_draw_injection_grid()
@@ -0,0 +1,144 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+from astropy.timeseries import LombScargle
+
+from raphs.periodogram import _frequency_grid, _ls_power_direct, LSPeriodogram
+
+
+def test_ls_power_direct() -> None:
+    """Test direct LS sums against astropy
+
+    """
+    rng = np.random.default_rng(42)
+    t = np.sort(rng.uniform(0, 5000, 25))
+    y = np.sin(2*np.pi*t/37.) + rng.normal(0, 0.5, 25)
+    dy = rng.uniform(0.3, 0.8, 25)
+    f = np.linspace(1e-4, 0.3, 5000)
+
+    # floating mean
+    power = _ls_power_direct(t, y, dy, f)
+    power_ref = LombScargle(t, y, dy).power(f, method='cython')
+    assert np.allclose(power, power_ref, atol=1e-10)
+
+    # window function
+    power = _ls_power_direct(t, np.ones(25), None, f, fit_mean=False, center_data=False)
+    power_ref = LombScargle(t, np.ones(25), fit_mean=False, center_data=False).power(f, method='slow')
+    assert np.allclose(power, power_ref, atol=1e-10)
+
+    return None
+
+
+def test_frequency_grid() -> None:
+    """Test frequency grid spacing and length
+
+    """
+    for min_per, max_per, delta_f in [(3.1, 7000., 1e-5), (1., 2., 0.5/1024), (4., 4000., 2.4975e-4/256)]:
+        f = _frequency_grid(min_per, max_per, delta_f)
+        assert np.isclose(f[0], 1/max_per) and np.isclose(f[-1], 1/min_per)
+        assert np.diff(f).max() <= delta_f
+        assert len(f) & (len(f) - 1) == 0
+
+    return None
+
+
+def test_fap_thresh_analytic() -> None:
+    """Test analytic FAP threshold against astropy's naive method
+
+    """
+    rng = np.random.default_rng(42)
+    t = np.sort(rng.uniform(0, 5000, 40))
+    y = rng.normal(0, 1, 40)
+    f = np.linspace(1e-4, 0.3, 5000)
+    power = LombScargle(t, y).power(f)
+
+    thresh, fap_min = LSPeriodogram.compute_fap_thresh_analytic(power, f, 0.001, len(t), np.ptp(t))
+    ls = LombScargle(t, y)
+    assert np.isclose(thresh, ls.false_alarm_level(0.001, method='naive', maximum_frequency=f[-1]))
+    assert np.isclose(fap_min, ls.false_alarm_probability(power.max(), method='naive', maximum_frequency=f[-1]), rtol=1e-4)
+
+    return None
+
+
+def _fake_star(n : int = 60) -> SimpleNamespace:
+    """Stand-in for StarData with two instruments
+
+    Args:
+        n (int, optional): number of observations. Defaults to 60.
+
+    Returns:
+        SimpleNamespace: object with rv_data and S_index_data
+    """
+    rng = np.random.default_rng(42)
+    jd = np.sort(rng.uniform(2_450_000, 2_452_000, n))
+    tel = np.where(np.arange(n) % 2, 'hires_pre', 'harps_pre')
+    data = SimpleNamespace(
+        hd_name='HD 0',
+        rv_data=pd.DataFrame(dict(jd=jd, mnvel=rng.normal(0, 3, n), errvel=np.ones(n), tel=tel)),
+        S_index_data=pd.DataFrame(dict(jd=jd, sind=rng.normal(0.2, 0.01, n), errs=np.full(n, 0.01), tel=tel)),
+    )
+
+    return data
+
+
+def test_lsps_nan(tmp_path) -> None:
+    """Test that a NaN in one instrument does not spread to the others
+
+    """
+    data = _fake_star()
+    data.rv_data.loc[0, 'mnvel'] = np.nan
+    assert data.rv_data.loc[0, 'tel'] == 'harps_pre'
+
+    lsps = LSPeriodogram(data, str(tmp_path)).compute_lsps(min_per=10, delta_f=1e-4)
+    for key in lsps:
+        assert np.isfinite(lsps[key]['rv_power']).all()
+
+    # the NaN point is left out
+    rvs = data.rv_data.dropna()
+    hires = rvs[rvs['tel'] == 'hires_pre']
+    harps = rvs[rvs['tel'] == 'harps_pre']
+    f = lsps['hires_pre']['frequency']
+    power_ref = LombScargle(hires['jd'], hires['mnvel'], hires['errvel']).power(f)
+    assert np.allclose(lsps['hires_pre']['rv_power'], power_ref, atol=1e-4)
+    f = lsps['harps_pre']['frequency']
+    power_ref = LombScargle(harps['jd'], harps['mnvel'], harps['errvel']).power(f)
+    assert np.allclose(lsps['harps_pre']['rv_power'], power_ref, atol=1e-4)
+
+    return None
+
+
+def test_lsp_cache(tmp_path) -> None:
+    """Test the opt-in periodogram cache
+
+    """
+    data = _fake_star()
+    output_dir = str(tmp_path / 'new_dir')
+
+    # no cache by default, and a missing output_dir is fine
+    lsp = LSPeriodogram(data, output_dir)
+    lsps = lsp.compute_lsps(min_per=10, delta_f=1e-4)
+    assert not os.path.exists(output_dir)
+
+    # cached periodograms match and are reloaded
+    lsps_cached = lsp.compute_lsps(min_per=10, delta_f=1e-4, cache=True)
+    assert len([fn for fn in os.listdir(output_dir) if fn.startswith('.lsp_cache_')]) == 1
+    lsps_loaded = lsp.compute_lsps(min_per=10, delta_f=1e-4, cache=True)
+    for tel in lsps:
+        for field in lsps[tel]:
+            assert np.array_equal(lsps[tel][field], lsps_cached[tel][field])
+            assert np.array_equal(lsps[tel][field], lsps_loaded[tel][field])
+
+    # new settings replace the old cache file
+    lsp.compute_lsps(min_per=20, delta_f=1e-4, cache=True)
+    assert len([fn for fn in os.listdir(output_dir) if fn.startswith('.lsp_cache_')]) == 1
+
+    return None
+
+
+
+if __name__ == '__main__':
+    test_ls_power_direct()
+    test_frequency_grid()
+    test_fap_thresh_analytic()
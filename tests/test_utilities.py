@@ -0,0 +1,30 @@
+import numpy as np
+
+from raphs.utilities import _sindex_coeffs, convert_rhkp_to_sindex
+
+
+def test_sindex_coeffs() -> None:
+    """Test S-index conversion coefficients against Gomes da Silva et al. (2021)
+
+    """
+    rhkp = np.array([1e-5, 2e-5, 4e-5])
+    for bv_mag in [0.55, 0.65, 0.9]:
+        for subgiant in [False, True]:
+            # direct evaluation of the published relations
+            if subgiant:
+                log_Ccf = -0.066 * bv_mag**3 - 0.25 * bv_mag**2 - 0.49 * bv_mag + 0.45
+            else:
+                log_Ccf = 0.25 * bv_mag**3 - 1.33 * bv_mag**2 + 0.43 * bv_mag + 0.24
+            Rphot_ref = 10**(-4.898 + 1.918 * bv_mag**2 - 2.893 * bv_mag**3)
+            S_ref = (rhkp + Rphot_ref) / (1.34e-4 * 10**log_Ccf)
+
+            Rphot, scale = _sindex_coeffs(bv_mag, subgiant=subgiant)
+            assert np.isclose(Rphot, Rphot_ref, rtol=1e-12)
+            assert np.allclose(convert_rhkp_to_sindex(rhkp, bv_mag, subgiant=subgiant), S_ref, rtol=1e-12)
+
+    return None
+
+
+
+if __name__ == '__main__':
+    test_sindex_coeffs()